@@ -3,8 +3,28 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
+import plotly.io as pio
+import functools
+import hashlib
+import inspect
+import os
+import sqlite3
+import threading
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import quote
 from datetime import datetime, timedelta
 
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos, el os.replace atómico alcanza
+    fcntl = None
+
 # ==============================================================================
 # 1. CX BRAND IDENTITY & GLOBAL CONFIG
 # ==============================================================================
@@ -80,19 +100,188 @@ def inject_cx_industrial_design():
     """, unsafe_allow_html=True)
 
 # ==============================================================================
-# 3. COMPONENTES DE VISUALIZACIÓN
+# 3. PROFILING (OPT-IN)
 # ==============================================================================
-def get_cx_template():
+# Se activa por proceso con GRIMOLDI_PROFILE=1 o por sesión con ?profile=1
+PROFILE_ENABLED = os.environ.get("GRIMOLDI_PROFILE") == "1"
+METRICS_PORT = int(os.environ.get("GRIMOLDI_METRICS_PORT", 9464))
+
+class StageMetrics:
+    # Registro de proceso: latencia por etapa, bytes enviados por tipo de elemento y caches observadas.
+    # Lo que ocurre dentro de collect_run() se registra además en el detalle del rerun actual.
+    def __init__(self, always=False):
+        self.always = always
+        self.stages, self.payload, self.caches = {}, {}, {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def active(self):
+        return self.always or getattr(self._local, "run", None) is not None
+
+    @contextmanager
+    def collect_run(self):
+        run = {"stages": [], "payload": []}
+        self._local.run = run
+        try:
+            yield run
+        finally:
+            self._local.run = None
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            stat = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            stat[0] += 1; stat[1] += seconds; stat[2] = max(stat[2], seconds)
+        run = getattr(self._local, "run", None)
+        if run is not None: run["stages"].append((stage, seconds))
+
+    def observe_payload(self, element, nbytes):
+        with self._lock:
+            stat = self.payload.setdefault(element, [0, 0])
+            stat[0] += 1; stat[1] += nbytes
+        run = getattr(self._local, "run", None)
+        if run is not None: run["payload"].append((element, nbytes))
+
+    def register_cache(self, name, cache):
+        self.caches[name] = cache
+
+    def prometheus(self):
+        with self._lock:
+            stages, payload = dict(self.stages), dict(self.payload)
+        lines = ["# TYPE grimoldi_stage_seconds summary"]
+        for stage, (count, total, _) in sorted(stages.items()):
+            lines += [f'grimoldi_stage_seconds_count{{stage="{stage}"}} {count}', f'grimoldi_stage_seconds_sum{{stage="{stage}"}} {total:.6f}']
+        lines.append("# TYPE grimoldi_stage_seconds_max gauge")
+        lines += [f'grimoldi_stage_seconds_max{{stage="{stage}"}} {peak:.6f}' for stage, (_, _, peak) in sorted(stages.items())]
+        lines.append("# TYPE grimoldi_payload_bytes_total counter")
+        lines += [f'grimoldi_payload_bytes_total{{element="{element}"}} {nbytes}' for element, (_, nbytes) in sorted(payload.items())]
+        lines.append("# TYPE grimoldi_cache_requests_total counter")
+        for name, cache in sorted(self.caches.items()):
+            lines += [f'grimoldi_cache_requests_total{{cache="{name}",result="hit"}} {cache.hits}',
+                      f'grimoldi_cache_requests_total{{cache="{name}",result="miss"}} {cache.misses}']
+        return "\n".join(lines) + "\n"
+
+@st.cache_resource(show_spinner=False)
+def get_metrics():
+    return StageMetrics(always=PROFILE_ENABLED)
+
+def profiled(stage):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            metrics = get_metrics()
+            if not metrics.active(): return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                metrics.observe(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_server(port=METRICS_PORT):
+    # Endpoint Prometheus local: GET http://127.0.0.1:<port>/metrics
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    metrics = get_metrics()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404); return
+            body = metrics.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    except OSError:  # otra réplica ya expone el puerto
+        return None
+    threading.Thread(target=server.serve_forever, name="grimoldi-metrics", daemon=True).start()
+    return server
+
+def show_dataframe(df, **kwargs):
+    metrics = get_metrics()
+    if metrics.active():
+        import pyarrow as pa
+        metrics.observe_payload("dataframe", pa.Table.from_pandas(df, preserve_index=False).nbytes)
+    return st.dataframe(df, **kwargs)
+
+def show_chart(fig, **kwargs):
+    metrics = get_metrics()
+    if metrics.active(): metrics.observe_payload("plotly_chart", len(fig.to_json()))
+    return st.plotly_chart(fig, **kwargs)
+
+# ==============================================================================
+# 4. COMPONENTES DE VISUALIZACIÓN
+# ==============================================================================
+FIGURE_CACHE_MAXSIZE = 256
+
+def theme_fingerprint():
+    return tuple(CX_THEME.items())
+
+@st.cache_resource(show_spinner=False)
+def _build_cx_template(theme):
+    theme = dict(theme)
     return go.layout.Template(
         layout=go.Layout(
-            font=dict(family="Inter", color=CX_THEME["text"]),
+            font=dict(family="Inter", color=theme["text"]),
             paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
-            xaxis=dict(showgrid=False, zeroline=False, color=CX_THEME["neutral"]),
-            yaxis=dict(showgrid=True, gridcolor="#D1D9DB", zeroline=False, color=CX_THEME["neutral"]),
+            xaxis=dict(showgrid=False, zeroline=False, color=theme["neutral"]),
+            yaxis=dict(showgrid=True, gridcolor="#D1D9DB", zeroline=False, color=theme["neutral"]),
             margin=dict(l=10, r=10, t=30, b=10)
         )
     )
 
+def get_cx_template():
+    return _build_cx_template(theme_fingerprint())
+
+class FigureCache:
+    # LRU acotado de figuras serializadas (JSON), compartido por todas las sesiones del proceso
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, builder):
+        with self._lock:
+            spec = self._data.get(key)
+            if spec is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+        if spec is None:
+            spec = builder().to_json()
+            with self._lock:
+                self.misses += 1
+                self._data[key] = spec
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize: self._data.popitem(last=False)
+        return pio.from_json(spec, skip_invalid=True)
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache():
+    return FigureCache(FIGURE_CACHE_MAXSIZE)
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)): return tuple(_freeze(v) for v in value)
+    if isinstance(value, np.ndarray): return tuple(value.tolist())
+    return value
+
+def cached_chart(builder):
+    @profiled(f"chart.{builder.__name__}")
+    @functools.wraps(builder)
+    def wrapper(*args):
+        key = (builder.__name__, _freeze(args), theme_fingerprint())
+        return get_figure_cache().get_or_build(key, lambda: builder(*args))
+    return wrapper
+
+@cached_chart
 def chart_multi_donut(v1, v2):
     fig = go.Figure()
     fig.add_trace(go.Pie(values=[v1, 100-v1], hole=0.8, marker=dict(colors=[CX_THEME["primary"], "#D1D9DB"]), domain={'x': [0, 1], 'y': [0, 1]}))
@@ -100,137 +289,1170 @@ def chart_multi_donut(v1, v2):
     fig.update_layout(showlegend=False, height=250, template=get_cx_template())
     return fig
 
-def chart_stacked_area(data_y):
+@cached_chart
+def chart_stacked_area(data_y, x=None):
     fig = go.Figure()
-    fig.add_trace(go.Scatter(y=data_y, fill='tozeroy', fillcolor='rgba(87, 197, 228, 0.2)', line=dict(color=CX_THEME["cyan"], width=4), mode='lines'))
+    fig.add_trace(go.Scatter(x=x, y=data_y, fill='tozeroy', fillcolor='rgba(87, 197, 228, 0.2)', line=dict(color=CX_THEME["cyan"], width=4), mode='lines'))
     fig.update_layout(template=get_cx_template(), height=300)
     return fig
 
+@cached_chart
 def chart_rounded_bar(x, y):
     fig = go.Figure(go.Bar(x=x, y=y, marker=dict(color=CX_THEME["primary"]), width=0.6))
     fig.update_layout(template=get_cx_template(), height=300)
     return fig
 
-def chart_stepped(y):
-    fig = go.Figure(go.Scatter(y=y, line_shape='hv', line=dict(color=CX_THEME["accent"], width=4)))
+@cached_chart
+def chart_stepped(y, x=None):
+    fig = go.Figure(go.Scatter(x=x, y=y, line_shape='hv', line=dict(color=CX_THEME["accent"], width=4)))
     fig.update_layout(template=get_cx_template(), height=300)
     return fig
 
+@cached_chart
 def chart_radial_gauge(val):
     fig = go.Figure(go.Indicator(mode="gauge+number", value=val, gauge={'bar': {'color': CX_THEME["primary"]}, 'axis': {'range': [0, 100]}}))
     fig.update_layout(height=200, template=get_cx_template())
     return fig
 
-def chart_dual_line(y1, y2):
+@cached_chart
+def chart_dual_line(y1, y2, x=None):
     fig = go.Figure()
-    fig.add_trace(go.Scatter(y=y1, name="Real", line=dict(color=CX_THEME["primary"], width=4)))
-    fig.add_trace(go.Scatter(y=y2, name="Target", line=dict(color=CX_THEME["neutral"], dash='dot')))
+    fig.add_trace(go.Scatter(x=x, y=y1, name="Real", line=dict(color=CX_THEME["primary"], width=4)))
+    fig.add_trace(go.Scatter(x=x, y=y2, name="Target", line=dict(color=CX_THEME["neutral"], dash='dot')))
     fig.update_layout(template=get_cx_template(), height=300)
     return fig
 
 # ==============================================================================
-# 4. MASTER DATA ENGINE
+# 5. DATA SOURCE: BALANCE REAL (.db.zst)
 # ==============================================================================
-@st.cache_data
-def get_massive_audit_data():
-    base = datetime(2026, 1, 1)
+BALANCE_ARCHIVE = Path(__file__).with_name("Grimoldi_Balance_Real.db.zst")
+BALANCE_CACHE_DIR = Path(os.environ.get("GRIMOLDI_CACHE_DIR", Path.home() / ".cache" / "grimoldi_cx"))
+BALANCE_LIVE_DB = os.environ.get("GRIMOLDI_BALANCE_DB")
+DATA_SOURCE = os.environ.get("GRIMOLDI_DATA_SOURCE", "auto")  # auto | synthetic
+BALANCE_MMAP_BYTES = 256 * 1024 * 1024
+STREAM_CHUNK_BYTES = 1024 * 1024
+
+def _archive_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(STREAM_CHUNK_BYTES), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def build_once(target, build):
+    # Construye `target` una sola vez entre procesos: flock + escritura a .tmp + os.replace atómico
+    target = Path(target)
+    if target.exists(): return target
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with open(target.parent / f"{target.name}.lock", "w") as lock:
+        if fcntl: fcntl.flock(lock, fcntl.LOCK_EX)
+        if not target.exists():
+            tmp = target.with_suffix(f".{os.getpid()}.tmp")
+            try:
+                build(tmp)
+                os.replace(tmp, target)
+            finally:
+                if tmp.exists(): tmp.unlink()
+    return target
+
+@st.cache_resource(show_spinner=False)
+def materialize_balance_db(archive=BALANCE_ARCHIVE, cache_dir=BALANCE_CACHE_DIR):
+    # Descomprime una sola vez por contenido: todos los workers comparten el mismo .db
+    import zstandard
+    archive = Path(archive)
+
+    def decompress(tmp):
+        with open(archive, "rb") as src, open(tmp, "wb") as dst:
+            zstandard.ZstdDecompressor().copy_stream(src, dst, read_size=STREAM_CHUNK_BYTES, write_size=STREAM_CHUNK_BYTES)
+
+    return build_once(Path(cache_dir) / f"balance_{_archive_digest(archive)[:16]}.db", decompress)
+
+@contextmanager
+def open_readonly_db(path):
+    # El context manager de sqlite3.Connection sólo hace commit/rollback: acá además se cierra.
+    # quote(): un directorio de cache con ?, # o % no debe romper la URI
+    conn = sqlite3.connect(f"file:{quote(Path(path).as_posix())}?mode=ro", uri=True, check_same_thread=False)
+    try:
+        conn.execute(f"PRAGMA mmap_size={BALANCE_MMAP_BYTES}")
+        conn.execute("PRAGMA query_only=1")
+        yield conn
+    finally:
+        conn.close()
+
+def has_balance_source():
+    if DATA_SOURCE == "synthetic": return False
+    return bool(BALANCE_LIVE_DB) or BALANCE_ARCHIVE.exists()
+
+def balance_db_path():
+    # GRIMOLDI_BALANCE_DB apunta a un ERP vivo que recibe transacciones; si no, se usa el archivo versionado
+    return Path(BALANCE_LIVE_DB) if BALANCE_LIVE_DB else materialize_balance_db()
+
+# Proyección del ERP real al esquema de auditoría. Estado = conciliación cabecera vs detalle;
+# la base no registra encuestas, por lo que Satisfaccion queda nula.
+BALANCE_AUDIT_SQL = """
+    WITH v AS (SELECT * FROM Ventas_Cabecera {where}),
+    d AS (
+        SELECT vd.id_ticket, SUM(vd.cantidad * vd.precio_unitario) AS bruto,
+               SUM(vd.cantidad * p.costo_compra) AS costo, MAX(pr.lead_time_dias) AS lead_dias
+        FROM Ventas_Detalle vd
+        JOIN v ON v.id_ticket = vd.id_ticket
+        JOIN Productos p ON p.id_producto = vd.id_producto
+        LEFT JOIN Proveedores pr ON pr.id_proveedor = p.id_proveedor
+        GROUP BY vd.id_ticket
+    )
+    SELECT v.fecha_hora AS Fecha, v.id_ticket AS ID_TX, s.nombre_sucursal AS Local,
+           v.total_ticket AS Monto_Neto, d.costo AS Costo_OP, d.lead_dias * 24 AS Lead_Time_H,
+           NULL AS Satisfaccion,
+           CASE WHEN d.id_ticket IS NULL THEN 'Pendiente'
+                WHEN ABS(d.bruto - v.total_ticket) > 0.01 THEN 'Error'
+                ELSE 'Validado' END AS Estado
+    FROM v
+    JOIN Sucursales s ON s.id_sucursal = v.id_sucursal
+    LEFT JOIN d ON d.id_ticket = v.id_ticket
+    ORDER BY v.fecha_hora, v.id_ticket
+"""
+
+def fetch_balance_audit_since(hwm=None, db_path=None):
+    # hwm = (Fecha, ID_TX) de la última fila ingerida; None trae la historia completa
+    where, params = ("WHERE (fecha_hora, id_ticket) > (?, ?)", [hwm[0].strftime(FECHA_SQL_FORMAT), int(hwm[1])]) if hwm else ("", [])
+    with open_readonly_db(db_path or balance_db_path()) as conn:
+        df = pd.read_sql_query(BALANCE_AUDIT_SQL.format(where=where), conn, params=params, parse_dates=["Fecha"])
+    return df.astype(AUDIT_DTYPES)
+
+# ==============================================================================
+# 6. SHARED CACHE (MULTI-PROCESO)
+# ==============================================================================
+SHARED_CACHE_BACKEND = os.environ.get("GRIMOLDI_SHARED_CACHE", "arrow")
+# Tope de entradas por backend: las claves por `revision` de un ERP en vivo cambian en cada refresh
+SHARED_CACHE_MAX_ENTRIES = int(os.environ.get("GRIMOLDI_SHARED_CACHE_MAX", 64))
+
+class FrameCache:
+    # Contrato común: get/put de DataFrames por clave + `flight(key)`, que garantiza
+    # que una ráfaga de usuarios dispare un único cálculo por clave (single-flight)
+    def __init__(self, max_entries=SHARED_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = self.misses = 0
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def flight(self, key):
+        # Lock por clave con contador de usuarios: se descarta al salir el último, así las claves
+        # por `revision` no dejan un lock vivo por cada refresh
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if not entry[1]: del self._locks[key]
+
+    def _count(self, hit):
+        with self._guard:
+            if hit: self.hits += 1
+            else: self.misses += 1
+
+    def get_or_compute(self, key, compute):
+        df = self.get(key)
+        if df is None:
+            with self.flight(key):
+                df = self.get(key)  # otro worker pudo publicarlo mientras esperábamos el lock
+                if df is None:
+                    self._count(hit=False)
+                    df = compute()
+                    self.put(key, df)
+                    return df
+        self._count(hit=True)
+        return df
+
+class MemoryFrameCache(FrameCache):
+    # Stand-in local (un solo proceso, tests): mismo contrato sin tocar disco, LRU de max_entries
+    def __init__(self, max_entries=SHARED_CACHE_MAX_ENTRIES):
+        super().__init__(max_entries)
+        self._data = OrderedDict()
+
+    def get(self, key):
+        with self._guard:
+            if key not in self._data: return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, df):
+        with self._guard:
+            self._data[key] = df
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries: self._data.popitem(last=False)
+
+class ArrowIPCFrameCache(FrameCache):
+    # Archivos Arrow IPC memory-mapped en un directorio compartido por todas las réplicas.
+    # LRU por mtime (get lo renueva): al pasar max_entries se borran los más viejos con su .lock.
+    def __init__(self, root, max_entries=SHARED_CACHE_MAX_ENTRIES):
+        super().__init__(max_entries)
+        self.root = Path(root)
+
+    def _path(self, key):
+        return self.root / f"{hashlib.sha1(key.encode()).hexdigest()}.arrow"
+
+    def get(self, key):
+        import pyarrow as pa
+        path = self._path(key)
+        try:
+            os.utime(path)
+            with pa.memory_map(str(path)) as source:
+                return pa.ipc.open_file(source).read_all().to_pandas()
+        except FileNotFoundError:  # no existe, o lo desalojó otro proceso
+            return None
+
+    def put(self, key, df):
+        import pyarrow as pa
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(df)
+        tmp = path.with_name(f"_{path.name}.{os.getpid()}.tmp")
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in self.root.glob("*.arrow"):
+            try: entries.append((entry.stat().st_mtime, entry))
+            except FileNotFoundError: pass
+        for _, entry in sorted(entries)[:max(0, len(entries) - self.max_entries)]:
+            entry.unlink(missing_ok=True)
+            entry.with_suffix(".lock").unlink(missing_ok=True)
+
+    @contextmanager
+    def flight(self, key):
+        with super().flight(key):
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self._path(key).with_suffix(".lock"), "w") as lock:
+                if fcntl: fcntl.flock(lock, fcntl.LOCK_EX)
+                yield
+
+@st.cache_resource(show_spinner=False)
+def get_shared_cache(backend=SHARED_CACHE_BACKEND):
+    if backend == "memory": return MemoryFrameCache()
+    if backend == "arrow": return ArrowIPCFrameCache(BALANCE_CACHE_DIR / "frames")
+    raise ValueError(f"GRIMOLDI_SHARED_CACHE desconocido: {backend}")
+
+def code_fingerprint(*parts):
+    # Funciones por su código fuente, el resto por repr: cambia si cambia el código o el esquema
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update((inspect.getsource(part) if callable(part) else repr(part)).encode())
+    return digest.hexdigest()[:12]
+
+def shared_frame(*depends):
+    # Como st.cache_data, pero el resultado se comparte entre procesos vía get_shared_cache().
+    # La clave lleva la huella del código de `fn` y de `depends` (funciones, constantes, esquemas que
+    # usa), así una entrada escrita por una versión anterior de la app nunca se vuelve a leer.
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        fingerprint = code_fingerprint(fn, *depends)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = f"{fn.__name__}@{fingerprint}{_freeze(tuple(bound.arguments.items()))!r}"
+            return get_shared_cache().get_or_compute(key, lambda: fn(*bound.args, **bound.kwargs))
+        return wrapper
+    return decorator
+
+# ==============================================================================
+# 7. MASTER DATA ENGINE
+# ==============================================================================
+# Esquema compacto de auditoría: ~30 B/fila (Fecha 8 + ID_TX 4 + 4 numéricos x 4 + 2 categorías x 1).
+# Verificable con audit_bytes_per_row(df), que usa DataFrame.memory_usage(deep=True).
+AUDIT_DTYPES = {
+    'ID_TX': 'int32', 'Local': 'category', 'Monto_Neto': 'float32', 'Costo_OP': 'float32',
+    'Lead_Time_H': 'float32', 'Satisfaccion': 'float32', 'Estado': 'category'
+}
+AUDIT_BYTES_PER_ROW_TARGET = 32
+SYNTHETIC_LOCALES = ["Unicenter", "Florida", "Abasto", "E-Comm", "Rosario", "Córdoba", "Mendoza", "Palermo"]
+AUDIT_ESTADOS = ["Validado", "Pendiente", "Error"]
+ID_TX_FORMAT = "GR-%d"
+FECHA_SQL_FORMAT = '%Y-%m-%d %H:%M:%S'
+SYNTHETIC_ROWS = int(os.environ.get("GRIMOLDI_SYNTHETIC_ROWS", 1000))
+SYNTHETIC_SEED = 2026
+# Mismo período que el balance real (2024-2025), así 1M o 10M filas dan 24 particiones Mes=
+SYNTHETIC_START, SYNTHETIC_WINDOW = datetime(2024, 1, 1), timedelta(days=731)
+
+def audit_bytes_per_row(df):
+    return df.memory_usage(deep=True, index=False).sum() / max(len(df), 1)
+
+def build_audit_frame(n_rows=1000, seed=None, start=SYNTHETIC_START, window=SYNTHETIC_WINDOW):
+    # Las n_rows se reparten parejo en `window`: más filas = más transacciones por hora, no más años
+    rng = np.random.default_rng(seed)
+    offsets = (np.arange(n_rows, dtype=np.int64) * int(window.total_seconds()) // max(n_rows, 1))
+    local_codes = rng.integers(0, len(SYNTHETIC_LOCALES), n_rows, dtype=np.int8)
+    estado_codes = rng.choice(len(AUDIT_ESTADOS), n_rows, p=[0.85, 0.1, 0.05]).astype(np.int8)
     return pd.DataFrame({
-        'Fecha': [base + timedelta(hours=i) for i in range(1000)],
-        'ID_TX': [f'GR-{10000+i}' for i in range(1000)],
-        'Local': np.random.choice(["Unicenter", "Florida", "Abasto", "E-Comm", "Rosario", "Córdoba", "Mendoza", "Palermo"], 1000),
-        'Monto_Neto': np.random.uniform(5000, 85000, 1000).round(2),
-        'Costo_OP': np.random.uniform(2000, 30000, 1000).round(2),
-        'Lead_Time_H': np.random.randint(12, 72, 1000),
-        'Satisfaccion': np.random.randint(1, 100, 1000),
-        'Estado': np.random.choice(["Validado", "Pendiente", "Error"], 1000, p=[0.85, 0.1, 0.05])
+        'Fecha': pd.Timestamp(start) + pd.to_timedelta(offsets, unit='s'),
+        'ID_TX': np.arange(10000, 10000 + n_rows, dtype=np.int32),
+        'Local': pd.Categorical.from_codes(local_codes, SYNTHETIC_LOCALES),
+        'Monto_Neto': rng.uniform(5000, 85000, n_rows).round(2).astype(np.float32),
+        'Costo_OP': rng.uniform(2000, 30000, n_rows).round(2).astype(np.float32),
+        'Lead_Time_H': rng.integers(12, 72, n_rows).astype(np.float32),
+        'Satisfaccion': rng.integers(1, 100, n_rows).astype(np.float32),
+        'Estado': pd.Categorical.from_codes(estado_codes, AUDIT_ESTADOS)
     })
 
+@st.cache_data
+@shared_frame(build_audit_frame, SYNTHETIC_SEED, AUDIT_DTYPES)
+def get_massive_audit_data(n_rows=SYNTHETIC_ROWS):
+    return build_audit_frame(n_rows, seed=SYNTHETIC_SEED)
+
+@functools.lru_cache(maxsize=1)
+def data_fingerprint():
+    # Todo lo que decide el contenido del ledger y del audit store: si cambia, es otro dataset
+    return code_fingerprint(build_audit_frame, SYNTHETIC_START, SYNTHETIC_WINDOW, AUDIT_DTYPES, BALANCE_AUDIT_SQL,
+                            fetch_balance_audit_since, fetch_synthetic_since, write_audit_partition, _write_audit_store)
+
+def get_dataset_version():
+    source = balance_db_path().stem if has_balance_source() else f"synthetic_{SYNTHETIC_ROWS}_{SYNTHETIC_SEED}"
+    return f"{source}_{data_fingerprint()}"
+
+CUBE_MEASURES = ['Monto_Neto', 'Lead_Time_H', 'Satisfaccion']
+
+def partial_cube(df):
+    # Sumas y conteos aditivos por Local: se pueden acumular lote a lote sin recalcular
+    measures = df[CUBE_MEASURES].astype('float64')
+    grouped = measures.groupby(df['Local'], observed=True)
+    partial = grouped.agg(['sum', 'count'])
+    partial.columns = [f"{col}_{fn}" for col, fn in partial.columns]
+    partial = partial.astype({f"{col}_sum": 'float64' for col in CUBE_MEASURES})
+    partial['size'] = grouped.size()
+    partial.index = partial.index.astype(str).rename('Local')
+    return partial
+
+def finalize_cube(partial):
+    cube = partial.copy()
+    for col in CUBE_MEASURES:
+        cube[f"{col}_mean"] = cube[f"{col}_sum"] / cube[f"{col}_count"].where(cube[f"{col}_count"] > 0)
+    return cube
+
+@profiled("data.get_local_cube")
+def get_local_cube(version):
+    # Una sola pasada por Local, mantenida en el lugar por el ledger de ingesta de `version`
+    return get_audit_ledger(version).cube()
+
+SPECIALIZED_UNITS = {
+    "🛒 UNIDAD 1: COMERCIAL Y VENTAS": [
+        "Ranking de Facturación Bruta por Sucursal", "Tabla de Margen de Contribución por Local", "Matriz de Cumplimiento de Objetivos (Venta vs. Target)", 
+        "Desglose de Ticket Promedio por Región", "Tabla de Unidades por Ticket (UPT)", "Ranking de Venta por Metro Cuadrado", 
+        "Matriz de Medios de Pago (Cuotas vs. Contado)", "Tabla de Descuentos Otorgados", "Análisis de Ventas por Franja Horaria", 
+        "Ranking de Best Sellers por Local", "Tabla de Slow Movers (Mercadería estancada)", "Matriz de Ventas Cruzadas (Cross-selling)", 
+        "Tabla de Devoluciones por Motivo", "Ranking de Clientes VIP (Fidelización)", "Tabla de Nuevos Clientes vs. Recurrentes", 
+        "Matriz de Ventas por Género y Edad", "Tabla de Performance de Marcas Propias vs. Licencias", "Ranking de Locales por Tasa de Conversión", 
+        "Tabla de Impacto de Promociones Bancarias", "Matriz de Ventas por Temporada"
+    ],
+    "👥 UNIDAD 2: CAPITAL HUMANO": [
+        "Ranking de Productividad Individual (Venta/Hora)", "Tabla de Costo Laboral sobre Venta", "Matriz de Ausentismo por Sucursal", 
+        "Tabla de Horas Extra por Nodo Logístico", "Ranking de Comisiones a Liquidar", "Tabla de Rotación Temprana (Churn de empleados)", 
+        "Matriz de Capacitación CX", "Tabla de Incidencias Disciplinarias", "Ranking de Satisfacción del Cliente por Vendedor", 
+        "Tabla de Antigüedad vs. Performance", "Matriz de Costos de ART por Región", "Tabla de Gastos de Viáticos y Movilidad", 
+        "Ranking de Líderes de Tienda", "Tabla de Estructura de Dotación", "Matriz de Clima Organizacional", 
+        "Tabla de Productividad en Días Festivos", "Ranking de Cumplimiento de Horarios", "Tabla de Inversión en Uniformes y EPP", 
+        "Matriz de Beneficios vs. Retención", "Tabla de Evolución Salarial Real vs. Inflación"
+    ],
+    "📦 UNIDAD 3: LOGÍSTICA": [
+        "Matriz de Quiebre de Stock (Venta Perdida)", "Ranking de Lead Time CD a Sucursal", "Tabla de Exactitud de Inventario (ERI)", 
+        "Matriz de Transferencias Inter-sucursales", "Tabla de Costo de Flete por Par de Zapato", "Ranking de Proveedores por Tiempo de Entrega", 
+        "Tabla de Calidad de Recepción", "Matriz de Ocupación de Depósito", "Tabla de Antigüedad de Stock (Semanas en piso)", 
+        "Ranking de Velocidad de Picking", "Tabla de Siniestros en Transporte", "Matriz de Costo de Almacenamiento por M3", 
+        "Tabla de Despacho de E-Commerce (SLA)", "Ranking de Devoluciones Logísticas", "Tabla de Eficiencia de Rutas", 
+        "Matriz de Reposición Automática", "Tabla de Gastos de Embalaje e Insumos", "Ranking de Locales por Error de Inventario", 
+        "Tabla de Stock en Tránsito", "Matriz de Consumo Energético en CD"
+    ],
+    "💰 UNIDAD 4: FINANZAS": [
+        "Matriz de EBITDA consolidado por Local", "Tabla de Gastos Fijos (OPEX) por Sucursal", "Ranking de Impuestos por Jurisdicción", 
+        "Tabla de Conciliación Bancaria", "Matriz de Costo Financiero por Tarjeta", "Tabla de Días de Cobro (DSO)", 
+        "Ranking de Cuentas por Pagar", "Tabla de Inversión en Marketing por Campaña", "Matriz de Amortización de Bienes", 
+        "Tabla de Seguros y Pólizas", "Ranking de Gastos de Mantenimiento", "Tabla de Flujo de Caja Proyectado", 
+        "Matriz de Costo de Capital (WACC)", "Tabla de Margen Bruto por Línea de Negocio", "Ranking de Sucursales por ROI de Remodelación", 
+        "Tabla de Auditoría de Compras Directas", "Matriz de Eficiencia Impositiva", "Tabla de Resultado Financiero por Inflación (RECPAM)", 
+        "Ranking de Rentabilidad por M2 de Vidriera", "Tabla de Provisiones y Reservas"
+    ],
+    "🌐 UNIDAD 5: E-COMMERCE": [
+        "Embudo de Conversión Web (Funnel)", "Tabla de Costo de Adquisición de Cliente (CAC)", "Matriz de Tasa de Rebote por Landing Page", 
+        "Ranking de Productos más buscados (sin stock)", "Tabla de Tiempo de Carga de la Web vs. Ventas", "Matriz de Canales de Origen", 
+        "Tabla de Abandono de Carrito por Paso", "Ranking de Cupones de Descuento", "Tabla de Ticket Promedio Online vs. Offline", 
+        "Matriz de Pick-up in Store (Retiro en local)", "Tabla de Reseñas y Calificaciones por Producto", "Ranking de Dispositivos de Compra", 
+        "Tabla de Ubicación Geográfica de Compras Web", "Matriz de Publicidad en Redes Sociales", "Tabla de Tasa de Apertura de Newsletters", 
+        "Ranking de Influencers/Afiliados", "Tabla de Re-compras (Retención)", "Matriz de Errores en el Checkout", 
+        "Tabla de Costo de Logística Inversa", "Ranking de Cumplimiento de Promesa de Entrega"
+    ]
+}
+
+CUBE_SLICES = {
+    "ventas": (['Monto_Neto_sum', 'Monto_Neto_mean', 'Monto_Neto_count'], ['Total ($)', 'Promedio ($)', 'Tickets']),
+    "lead_time": (['Lead_Time_H_mean'], ['Promedio Horas']),
+    "score": (['Satisfaccion_mean'], ['Score/Tasa']),
+    "registros": (['size'], ['Registros']),
+}
+
+def classify_table(nombre_tabla):
+    if any(k in nombre_tabla for k in ("Facturación", "EBITDA", "Margen", "Ventas")): return "ventas"
+    if "Lead Time" in nombre_tabla: return "lead_time"
+    if any(k in nombre_tabla for k in ("Satisfacción", "Conversión", "Performance")): return "score"
+    if any(k in nombre_tabla for k in ("Local", "Sucursal", "Región")): return "registros"
+    return None
+
+def get_table_slice(cube, kind):
+    if kind is None:
+        return pd.DataFrame({"Estado": ["Sin info en base"], "Detalle": ["Requiere conexión a ERP"]})
+    cols, labels = CUBE_SLICES[kind]
+    return cube[cols].set_axis(labels, axis=1).reset_index()
+
 KPI_MASTER_LOGIC = {
     "Comercial": {
         "Ventas vs Costos": {
             "money": f"${(MONEY_VALUATION['REVENUE_TARGET'] * 0.12):,.0f}",
             "relacion": "Eficiencia marginal del capital. Afecta directamente al flujo libre de caja.",
-            "formula": "Revenue - (COGS + SG&A)", "impacto": "Alto"
+            "formula": "Revenue - (COGS + SG&A)", "formato": "money", "impacto": "Alto"
         },
         "Market Share": {
             "money": f"${(MONEY_VALUATION['MARKET_CAP_EST'] * 0.22):,.0f}",
             "relacion": "Posicionamiento relativo vs competencia directa en Malls.",
-            "formula": "Ventas Grimoldi / Ventas Totales Sector", "impacto": "Estratégico"
+            "formula": "Ventas Grimoldi / Ventas Totales Sector", "formato": "ratio", "impacto": "Estratégico"
         },
         "Ticket Promedio": {
             "money": "$92,450",
             "relacion": "Poder de compra y efectividad de up-selling en puntos de venta.",
-            "formula": "Total Revenue / N Transacciones", "impacto": "Medio"
+            "formula": "Total Revenue / N Transacciones", "formato": "money", "impacto": "Medio"
         },
         "Tasa de Conversión": {
             "money": f"${(MONEY_VALUATION['REVENUE_TARGET'] * 0.08):,.0f}",
             "relacion": "Eficiencia del embudo de ventas físico y digital.",
-            "formula": "(Tickets / Tráfico) * 100", "impacto": "Crítico"
+            "formula": "(Tickets / Tráfico) * 100", "formato": "pct", "impacto": "Crítico"
         }
     },
     "Capital Humano": {
         "Productividad": {
             "money": "$45,000 / H-H",
             "relacion": "Retorno de la inversión en capacitación y protocolos CX.",
-            "formula": "Venta Neta / Horas Hombre", "impacto": "Operativo"
+            "formula": "Venta Neta / Horas Hombre", "formato": "money", "impacto": "Operativo"
         },
         "Costo Laboral": {
             "money": f"${(MONEY_VALUATION['REVENUE_TARGET'] * 0.18):,.0f}",
             "relacion": "Peso de la nómina sobre el margen operativo bruto.",
-            "formula": "Nómina Total / Venta Neta", "impacto": "Financiero"
+            "formula": "Nómina Total / Venta Neta", "formato": "ratio", "impacto": "Financiero"
         },
         "Ausentismo": {
             "money": f"${(MONEY_VALUATION['OPEX_LIMIT'] * 0.04):,.0f}",
             "relacion": "Costo de oportunidad por puestos no cubiertos en horas pico.",
-            "formula": "Horas Perdidas / Horas Plan", "impacto": "Bajo"
+            "formula": "Horas Perdidas / Horas Plan", "formato": "ratio", "impacto": "Bajo"
         },
         "Rotación": {
             "money": "$25,000,000 anual",
             "relacion": "Costo de reclutamiento y pérdida de conocimiento institucional.",
-            "formula": "Bajas / Promedio Dotación", "impacto": "Cultura"
+            "formula": "Bajas / Promedio Dotación", "formato": "ratio", "impacto": "Cultura"
         }
     },
     "Logística": {
         "Stock vs Quiebre": {
             "money": f"${(MONEY_VALUATION['REVENUE_TARGET'] * 0.07):,.0f}",
             "relacion": "Venta perdida por falta de disponibilidad de talles críticos.",
-            "formula": "Demanda No Satisfecha / Demanda Total", "impacto": "Crítico"
+            "formula": "Demanda No Satisfecha / Demanda Total", "formato": "ratio", "impacto": "Crítico"
         },
         "Lead Time": {
             "money": "3.5 Días Promedio",
             "relacion": "Velocidad de reposición desde el CD a la red de sucursales.",
-            "formula": "Fecha Recepción - Fecha Pedido", "impacto": "Servicio"
+            "formula": "Fecha Recepción - Fecha Pedido", "formato": "dias", "impacto": "Servicio"
         },
         "Flete sobre Venta": {
             "money": f"${(MONEY_VALUATION['REVENUE_TARGET'] * 0.045):,.0f}",
             "relacion": "Erosión logística del margen por canal (E-Comm vs Retail).",
-            "formula": "Costo Transporte / Venta Neta", "impacto": "Margen"
+            "formula": "Costo Transporte / Venta Neta", "formato": "ratio", "impacto": "Margen"
         },
         "Rotación Inv": {
             "money": "2.8x Anual",
             "relacion": "Salud del inventario y frescura de la colección en salón.",
-            "formula": "CMV / Inventario Promedio", "impacto": "Liquidez"
+            "formula": "CMV / Inventario Promedio", "formato": "veces", "impacto": "Liquidez"
         }
     }
 }
 
+HOME_CARDS = [
+    {"label": "ROI OPERATIVO", "formula": "(Revenue - (COGS + SG&A)) / (COGS + SG&A) * 100", "formato": "pct",
+     "badge": "COGS + SG&A", "ref": ("28.4%", "$355,000,000"), "barra": 75},
+    {"label": "MARGEN NETO", "formula": "(Revenue - (COGS + SG&A)) / Revenue * 100", "formato": "pct",
+     "badge": "Revenue", "ref": ("14.8%", "$185,000,000"), "barra": 45},
+    {"label": "EBITDA M$", "formula": "(Revenue - (COGS + SG&A)) / 1000000", "formato": "num",
+     "badge": "Revenue - (COGS + SG&A)", "ref": ("18.2", "$227,500,000"), "barra": 90},
+    {"label": "STOCK HEALTH", "formula": "Stock Disponible / Stock Objetivo * 100", "formato": "pct",
+     "badge": "Valor Inventario", "ref": ("82.0%", "$1,025,000,000"), "barra": 82},
+]
+
 def get_money_explanation(kpi_name, value):
-    base = MONEY_VALUATION['REVENUE_TARGET']
+    revenue = compute_kpi("Revenue", periodo="anual")
+    base = revenue if pd.notna(revenue) else MONEY_VALUATION['REVENUE_TARGET']
     impacto_cash = (value / 100) * base
     return f"El {value}% en {kpi_name} representa un impacto de ${impacto_cash:,.2f} ARS en el balance actual."
 
 # ==============================================================================
-# 5. RENDER FUNCTIONS
+# 8. AUDIT STORE: PAGINACIÓN SERVER-SIDE
+# ==============================================================================
+AUDIT_COLUMNS = list(build_audit_frame(0).columns)
+AUDIT_PAGE_SIZES = [50, 100, 250, 500]
+AUDIT_INSERT_CHUNK = 50_000
+
+def _write_audit_store(path, df):
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.execute("""
+            CREATE TABLE audit (
+                ID_TX INTEGER PRIMARY KEY, Fecha TEXT NOT NULL, Local TEXT NOT NULL,
+                Monto_Neto REAL, Costo_OP REAL, Lead_Time_H REAL, Satisfaccion REAL, Estado TEXT NOT NULL
+            )""")
+        for start in range(0, len(df), AUDIT_INSERT_CHUNK):
+            chunk = df.iloc[start:start + AUDIT_INSERT_CHUNK]
+            chunk = chunk.assign(Fecha=chunk['Fecha'].dt.strftime(FECHA_SQL_FORMAT))
+            chunk.to_sql('audit', conn, if_exists='append', index=False)
+        conn.execute("CREATE INDEX ix_audit_fecha ON audit (Fecha, ID_TX)")
+        conn.execute("CREATE INDEX ix_audit_local ON audit (Local, Fecha)")
+        conn.execute("CREATE INDEX ix_audit_estado ON audit (Estado, Fecha)")
+        conn.execute("ANALYZE")
+
+@st.cache_resource(show_spinner=False)
+def materialize_audit_store(version):
+    ledger = get_audit_ledger(version)
+
+    def build(tmp):
+        # Con el ledger tomado: ninguna ingesta puede colarse entre la lectura y la publicación del store
+        with ledger.exclusive():
+            _write_audit_store(tmp, ledger.read_frame())
+
+    return build_once(audit_store_path(version), build)
+
+def audit_store_path(version):
+    return BALANCE_CACHE_DIR / f"audit_{version}.db"
+
+def append_audit_store(version, df):
+    path = audit_store_path(version)
+    if df.empty or not path.exists(): return
+    rows = df[AUDIT_COLUMNS].assign(Fecha=df['Fecha'].dt.strftime(FECHA_SQL_FORMAT)).astype({'Local': str, 'Estado': str})
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.executemany(f"INSERT OR IGNORE INTO audit ({', '.join(AUDIT_COLUMNS)}) VALUES ({', '.join('?' * len(AUDIT_COLUMNS))})",
+                         rows.astype(object).where(rows.notna(), None).itertuples(index=False, name=None))
+
+def _audit_where(locales=None, estados=None, fecha_desde=None, fecha_hasta=None):
+    clauses, params = [], []
+    if locales:
+        clauses.append(f"Local IN ({','.join('?' * len(locales))})"); params += list(locales)
+    if estados:
+        clauses.append(f"Estado IN ({','.join('?' * len(estados))})"); params += list(estados)
+    if fecha_desde is not None:
+        clauses.append("Fecha >= ?"); params.append(pd.Timestamp(fecha_desde).strftime(FECHA_SQL_FORMAT))
+    if fecha_hasta is not None:
+        # Fecha hasta inclusiva: todo el día indicado
+        clauses.append("Fecha < ?"); params.append((pd.Timestamp(fecha_hasta) + pd.Timedelta(days=1)).strftime(FECHA_SQL_FORMAT))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+@profiled("data.get_audit_store_facets")
+@st.cache_data(show_spinner=False, max_entries=4)
+def get_audit_store_facets(version, revision):
+    with open_readonly_db(materialize_audit_store(version)) as conn:
+        locales = [r[0] for r in conn.execute("SELECT DISTINCT Local FROM audit ORDER BY Local")]
+        estados = [r[0] for r in conn.execute("SELECT DISTINCT Estado FROM audit ORDER BY Estado")]
+        fecha_min, fecha_max = conn.execute("SELECT MIN(Fecha), MAX(Fecha) FROM audit").fetchone()
+    return {"locales": locales, "estados": estados,
+            "fecha_min": pd.Timestamp(fecha_min).date() if fecha_min else None,
+            "fecha_max": pd.Timestamp(fecha_max).date() if fecha_max else None}
+
+@profiled("data.count_audit_rows")
+@st.cache_data(show_spinner=False, max_entries=256)
+def count_audit_rows(version, revision, locales=None, estados=None, fecha_desde=None, fecha_hasta=None):
+    where, params = _audit_where(locales, estados, fecha_desde, fecha_hasta)
+    with open_readonly_db(materialize_audit_store(version)) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM audit{where}", params).fetchone()[0]
+
+@profiled("data.query_audit_page")
+def query_audit_page(version, page=0, page_size=100, sort_by='Fecha', descending=False,
+                     locales=None, estados=None, fecha_desde=None, fecha_hasta=None):
+    if sort_by not in AUDIT_COLUMNS: raise ValueError(f"Columna de orden inválida: {sort_by}")
+    where, params = _audit_where(locales, estados, fecha_desde, fecha_hasta)
+    direction = "DESC" if descending else "ASC"
+    sql = (f"SELECT {', '.join(AUDIT_COLUMNS)} FROM audit{where} "
+           f"ORDER BY {sort_by} {direction}, ID_TX {direction} LIMIT ? OFFSET ?")
+    with open_readonly_db(materialize_audit_store(version)) as conn:
+        df = pd.read_sql_query(sql, conn, params=params + [page_size, page * page_size], parse_dates=["Fecha"])
+    return df.astype(AUDIT_DTYPES)
+
+# ==============================================================================
+# 9. INGESTA INCREMENTAL: PARTICIONES APPEND-ONLY
 # ==============================================================================
+INGEST_REFRESH_SECONDS = int(os.environ.get("GRIMOLDI_INGEST_REFRESH_S", 300))
+
+PARQUET_ROW_GROUP_ROWS = 64_000
+# Un refresh cada pocos minutos deja un archivo chico por mes tocado: pasado este umbral se compactan
+LEDGER_COMPACT_PARTS = int(os.environ.get("GRIMOLDI_COMPACT_PARTS", 8))
+
+def write_audit_partition(part, path):
+    # Un row group por Local (partido en bloques de PARQUET_ROW_GROUP_ROWS): las estadísticas
+    # min/max de Local permiten saltear todo lo que no sea la sucursal pedida
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    part = part[AUDIT_COLUMNS].astype({'Local': str, 'Estado': str}).sort_values(['Local', 'Fecha', 'ID_TX'], kind='stable')
+    table = pa.Table.from_pandas(part, preserve_index=False)
+    bounds = np.flatnonzero(part['Local'].to_numpy()[1:] != part['Local'].to_numpy()[:-1]) + 1
+    with pq.ParquetWriter(path, table.schema, compression='zstd') as writer:
+        for start, stop in zip(np.r_[0, bounds], np.r_[bounds, len(part)]):
+            for offset in range(start, stop, PARQUET_ROW_GROUP_ROWS):
+                writer.write_table(table.slice(offset, min(PARQUET_ROW_GROUP_ROWS, stop - offset)))
+
+class AuditLedger:
+    # Particiones mensuales Parquet append-only + high-water mark (Fecha, ID_TX) + cubo por Local.
+    # El estado vive en disco (_ledger.json) y se relee bajo flock, así varios procesos no duplican filas.
+    def __init__(self, root, fetch_since, on_append=None):
+        self.root = Path(root)
+        self.fetch_since = fetch_since
+        self.on_append = on_append
+        self.hwm, self.rows, self.partial = None, 0, None
+        self.rollups = RollupIndex()
+        self.last_refresh = 0.0
+        self._lock = threading.RLock()
+        self._fetching = threading.Lock()
+        self._depth = 0
+
+    @contextmanager
+    def exclusive(self):
+        with self._lock:
+            if self._depth:  # reentrante: flock sobre un segundo descriptor se bloquearía a sí mismo
+                yield self; return
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.root / "_ledger.lock", "w") as lock:
+                if fcntl: fcntl.flock(lock, fcntl.LOCK_EX)
+                self._depth += 1
+                try:
+                    self._load()
+                    for manifest in self.root.glob("Mes=*/_compact.json"): self._finish_compaction(manifest)
+                    yield self
+                finally:
+                    self._depth -= 1
+
+    def _load(self):
+        path = self.root / "_ledger.json"
+        if not path.exists(): return
+        state = json.loads(path.read_text())
+        if state["rows"] == self.rows: return
+        self.hwm = (pd.Timestamp(state["hwm"][0]), state["hwm"][1]) if state["hwm"] else None
+        self.rows = state["rows"]
+        self.partial = pd.DataFrame(state["cube"]).rename_axis('Local') if state["cube"] else None
+
+    def _save(self):
+        state = {"hwm": [self.hwm[0].isoformat(), self.hwm[1]] if self.hwm else None, "rows": self.rows,
+                 "cube": self.partial.to_dict() if self.partial is not None else None}
+        tmp = self.root / f"_ledger.{os.getpid()}.tmp"
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, self.root / "_ledger.json")
+
+    def revision(self):
+        return self.rows
+
+    def cube(self):
+        return finalize_cube(self.partial) if self.partial is not None else finalize_cube(partial_cube(build_audit_frame(0)))
+
+    def _append(self, df):
+        if self.hwm is not None:
+            fecha, id_tx = self.hwm
+            df = df[(df['Fecha'] > fecha) | ((df['Fecha'] == fecha) & (df['ID_TX'] > id_tx))]
+        if df.empty: return df
+        df = df.sort_values(['Fecha', 'ID_TX'], kind='stable')
+        for mes, part in df.groupby(df['Fecha'].dt.to_period('M'), sort=False):
+            # El nombre sale del rango de IDs: re-ingerir el mismo lote tras una caída pisa el archivo, no duplica
+            target = self.root / f"Mes={mes}" / f"part-{part['ID_TX'].iloc[0]}-{part['ID_TX'].iloc[-1]}.parquet"
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_name(f"_{target.name}.{os.getpid()}.tmp")
+            write_audit_partition(part, tmp)
+            os.replace(tmp, target)
+            if len(list(target.parent.glob("part-*.parquet"))) > LEDGER_COMPACT_PARTS: self._compact(target.parent)
+        delta = partial_cube(df)
+        self.partial = delta if self.partial is None else self.partial.add(delta, fill_value=0)
+        # Si los rollups estaban al día se actualizan con el lote; si no, rollup_index() los reconstruye
+        if self.rollups.rows == self.rows: self.rollups.add(df)
+        self.hwm = (df['Fecha'].iloc[-1], int(df['ID_TX'].iloc[-1]))
+        self.rows += len(df)
+        self._save()
+        if self.on_append: self.on_append(df)
+        return df
+
+    def _compact(self, month_dir):
+        # Reescribe las partes del mes en un solo archivo. El manifiesto se escribe antes de borrar nada:
+        # si el proceso muere a mitad, el próximo exclusive() termina el trabajo con _finish_compaction
+        sources = sorted(month_dir.glob("part-*.parquet"))
+        df = pd.concat([pd.read_parquet(source) for source in sources], ignore_index=True)
+        df = df.sort_values(['Fecha', 'ID_TX'], kind='stable', ignore_index=True)
+        target = f"part-{df['ID_TX'].iloc[0]}-{df['ID_TX'].iloc[-1]}.parquet"
+        tmp = month_dir / f"_{target}.{os.getpid()}.tmp"
+        write_audit_partition(df, tmp)
+        os.replace(tmp, month_dir / "_compact.pending")
+        manifest = {"target": target, "sources": [source.name for source in sources]}
+        (month_dir / f"_compact.{os.getpid()}.tmp").write_text(json.dumps(manifest))
+        os.replace(month_dir / f"_compact.{os.getpid()}.tmp", month_dir / "_compact.json")
+        self._finish_compaction(month_dir / "_compact.json")
+
+    def _finish_compaction(self, manifest_path):
+        month_dir, pending = manifest_path.parent, manifest_path.parent / "_compact.pending"
+        if pending.exists():
+            manifest = json.loads(manifest_path.read_text())
+            for name in manifest["sources"]:
+                if name != manifest["target"]: (month_dir / name).unlink(missing_ok=True)
+            os.replace(pending, month_dir / manifest["target"])
+        manifest_path.unlink()
+
+    def ingest(self, df):
+        with self.exclusive():
+            return self._append(df)
+
+    def refresh(self):
+        # El fetch (en el ERP, un scan completo) corre sin el lock: los reruns que leen el ledger no lo
+        # esperan. _append vuelve a filtrar contra el hwm vigente, así un lote solapado no duplica.
+        # Un solo fetch por proceso a la vez: si ya hay uno en curso, este refresh no hace nada.
+        if not self._fetching.acquire(blocking=False): return build_audit_frame(0)
+        try:
+            with self.exclusive(): hwm = self.hwm
+            batch = self.fetch_since(hwm)
+            with self.exclusive(): added = self._append(batch)
+            self.last_refresh = time.time()
+        finally:
+            self._fetching.release()
+        return added
+
+    def rollup_index(self):
+        with self.exclusive():
+            if self.rollups.rows != self.rows:  # otro proceso agregó filas, o recién se abrió el ledger
+                self.rollups.rebuild(self.read_frame(['Fecha', 'Local', *ROLLUP_MEASURES]), self.rows)
+            return self.rollups
+
+    def read_frame(self, columns=None, locales=None, meses=None):
+        # Proyección (sólo `columns`) y predicados: `meses` poda directorios Mes=, `locales` poda row groups
+        columns = list(columns or AUDIT_COLUMNS)
+        filters = []
+        if locales: filters.append(('Local', 'in', list(locales)))
+        if meses: filters.append(('Mes', 'in', list(meses)))
+        with self.exclusive():
+            if not self.rows: return build_audit_frame(0)[columns]
+            df = pd.read_parquet(self.root, columns=columns, filters=filters or None)
+        if {'Fecha', 'ID_TX'} <= set(columns):
+            df = df.sort_values(['Fecha', 'ID_TX'], kind='stable', ignore_index=True)
+        return df.astype({k: v for k, v in AUDIT_DTYPES.items() if k in df})
+
+def fetch_synthetic_since(hwm=None):
+    # El dataset sintético no tiene feed: sólo el lote inicial
+    return get_massive_audit_data() if hwm is None else build_audit_frame(0)
+
+@st.cache_resource(show_spinner=False)
+def get_audit_ledger(version):
+    fetch = fetch_balance_audit_since if has_balance_source() else fetch_synthetic_since
+    ledger = AuditLedger(BALANCE_CACHE_DIR / f"ledger_{version}", fetch, on_append=lambda df: append_audit_store(version, df))
+    ledger.refresh()
+    return ledger
+
+def export_balance_parquet(dest, archive=BALANCE_ARCHIVE):
+    # Conversión única .db.zst -> dataset Parquet particionado por Mes; re-ejecutar sólo agrega lo nuevo
+    ledger = AuditLedger(dest, lambda hwm: fetch_balance_audit_since(hwm, materialize_balance_db(archive)))
+    ledger.refresh()
+    return ledger
+
+def query_audit_columns(columns, locales=None, meses=None, version=None):
+    return get_audit_ledger(version or get_dataset_version()).read_frame(columns, locales, meses)
+
+@profiled("data.refresh_audit_data")
+def refresh_audit_data(max_age=INGEST_REFRESH_SECONDS):
+    ledger = get_audit_ledger(get_dataset_version())
+    if time.time() - ledger.last_refresh >= max_age: ledger.refresh()
+    return ledger
+
+# ==============================================================================
+# 10. ROLLUPS TEMPORALES (HORA / DÍA / SEMANA / MES)
+# ==============================================================================
+# Sumas y conteos aditivos por (Bucket, Local): un rango de fechas se resuelve con
+# searchsorted sobre el bucket + groupby de un puñado de filas, sin tocar las particiones.
+ROLLUP_MEASURES = ['Monto_Neto', 'Costo_OP', 'Lead_Time_H', 'Satisfaccion']
+ROLLUP_RESOLUTIONS = {"hora": "h", "día": "D", "semana": "W", "mes": "M"}
+# Span máximo del rango -> resolución: el gráfico queda entre ~24 y ~100 puntos
+ROLLUP_AUTO = [(pd.Timedelta(days=3), "h"), (pd.Timedelta(days=92), "D"), (pd.Timedelta(days=730), "W")]
+
+def rollup_bucket(fecha, res):
+    if res in ("h", "D"): return fecha.dt.floor(res)
+    return fecha.dt.to_period(res).dt.start_time
+
+def pick_resolution(desde, hasta):
+    span = pd.Timestamp(hasta) - pd.Timestamp(desde)
+    return next((res for limite, res in ROLLUP_AUTO if span <= limite), "M")
+
+def rollup_delta(df, res):
+    measures = df[ROLLUP_MEASURES].astype('float64')
+    keys = [rollup_bucket(df['Fecha'], res).rename('Bucket'), df['Local'].astype(str).rename('Local')]
+    grouped = measures.groupby(keys, sort=True)
+    out = grouped.agg(['sum', 'count'])
+    out.columns = [f"{m}_{agg}" for m, agg in out.columns]
+    out['size'] = grouped.size()
+    return out.reset_index()
+
+class RollupIndex:
+    # Vive en memoria del proceso y lo mantiene AuditLedger._append; `rows` dice hasta qué fila del ledger cubre.
+    # Cada resolución se publica como una tupla inmutable (frame, keys): query() corre sin el lock del
+    # ledger y lee siempre un par consistente aunque otro hilo esté agregando un lote.
+    def __init__(self):
+        self.frames, self.rows = {}, 0
+
+    def _publish(self, res, frame):
+        self.frames[res] = (frame, frame['Bucket'].to_numpy())
+
+    def rebuild(self, df, rows):
+        for res in ROLLUP_RESOLUTIONS.values(): self._publish(res, rollup_delta(df, res))
+        self.rows = rows
+
+    def add(self, df):
+        # Los datos nuevos caen al final: sólo se re-agregan los buckets desde el primero afectado
+        for res in ROLLUP_RESOLUTIONS.values():
+            delta, (cur, keys) = rollup_delta(df, res), self.frames.get(res, (None, None))
+            if cur is None or cur.empty: self._publish(res, delta); continue
+            cut = keys.searchsorted(delta['Bucket'].iloc[0].to_datetime64())
+            tail = pd.concat([cur.iloc[cut:], delta]).groupby(['Bucket', 'Local'], sort=True).sum().reset_index()
+            self._publish(res, pd.concat([cur.iloc[:cut], tail], ignore_index=True))
+        self.rows += len(df)
+
+    def bounds(self):
+        keys = self.frames.get("h", (None, None))[1]
+        if keys is None or not len(keys): return None
+        return pd.Timestamp(keys[0]), pd.Timestamp(keys[-1])
+
+    def query(self, desde, hasta, measure='Monto_Neto', agg='sum', resolution=None, locales=None, by='Bucket'):
+        # Serie indexada por `by` (Bucket o Local); hasta es inclusivo a nivel día
+        res = resolution or pick_resolution(desde, hasta)
+        if res not in self.frames: return pd.Series(dtype='float64')
+        frame, keys = self.frames[res]
+        desde = rollup_bucket(pd.Series([pd.Timestamp(desde)]), res).iloc[0]
+        hasta = pd.Timestamp(hasta).normalize() + pd.Timedelta(days=1)
+        rows = frame.iloc[keys.searchsorted(desde.to_datetime64()):keys.searchsorted(hasta.to_datetime64())]
+        if locales: rows = rows[rows['Local'].isin(list(locales))]
+        if measure == 'size': return rows.groupby(by, sort=True)['size'].sum()
+        grouped = rows.groupby(by, sort=True)[[f"{measure}_sum", f"{measure}_count"]].sum()
+        if agg == 'sum': return grouped[f"{measure}_sum"]
+        return grouped[f"{measure}_sum"] / grouped[f"{measure}_count"].where(grouped[f"{measure}_count"] > 0)
+
+@profiled("data.rollup_index")
+def get_rollup_index(version=None):
+    return get_audit_ledger(version or get_dataset_version()).rollup_index()
+
+# ==============================================================================
+# 11. KPI ENGINE
+# ==============================================================================
+# Nombre usado en las fórmulas de KPI_MASTER_LOGIC -> (serie por fila, agregación).
+# Lo que no figura acá no existe en la base: el KPI da NaN y la UI muestra el valor de referencia.
+KPI_MEASURES = {
+    "Revenue": ("monto", "sum"), "Total Revenue": ("monto", "sum"), "Venta Neta": ("monto", "sum"),
+    "Ventas Grimoldi": ("monto", "sum"),
+    "COGS": ("costo", "sum"), "CMV": ("costo", "sum"),
+    "N Transacciones": ("tx", "sum"), "Tickets": ("tx", "sum"),
+    "Fecha Pedido": ("pedido", "mean"), "Fecha Recepción": ("recepcion", "mean"),
+    "SG&A": ("gasto_total", "sum"), "Nómina Total": ("gasto_nomina", "sum"),
+}
+# Período por defecto de las tarjetas y la vista de categoría: el último trimestre con datos
+KPI_PERIODO = "trimestre"
+KPI_PERIODOS = {"anual": 12}
+KPI_TOKEN = re.compile(r"\s*([()+\-*/])\s*")
+
+def compile_formula(formula):
+    # "Total Revenue / N Transacciones" -> ("m[0] / m[1]", ("Total Revenue", "N Transacciones"))
+    names, parts = [], []
+    for token in filter(None, (t.strip() for t in KPI_TOKEN.split(formula))):
+        if token in "()+-*/": parts.append(token)
+        elif re.fullmatch(r"\d+(\.\d+)?", token): parts.append(token)
+        else:
+            if token not in names: names.append(token)
+            parts.append(f"m[{names.index(token)}]")
+    return compile(" ".join(parts), f"<kpi {formula}>", "eval"), tuple(names)
+
+GASTOS_SQL = """
+    SELECT s.nombre_sucursal AS Local, substr(g.fecha_emision, 1, 7) AS Mes,
+           SUM(g.monto) AS gasto_total_sum,
+           SUM(CASE WHEN g.categoria = 'Sueldos y Cargas' THEN g.monto ELSE 0 END) AS gasto_nomina_sum
+    FROM Gastos_Operativos g JOIN Sucursales s ON s.id_sucursal = g.id_sucursal
+    GROUP BY 1, 2
+"""
+
+@st.cache_data(show_spinner=False, max_entries=4)
+@shared_frame(KPI_MEASURES, GASTOS_SQL, AUDIT_DTYPES)
+def get_kpi_base(version, revision):
+    # Una pasada: sumas y conteos por (Local, Mes) de todas las series que usan las fórmulas
+    df = get_audit_ledger(version).read_frame(['Fecha', 'Local', 'Monto_Neto', 'Costo_OP', 'Lead_Time_H'])
+    fecha_dias = (df['Fecha'] - pd.Timestamp(0)) / pd.Timedelta(days=1)
+    con_lead = df['Lead_Time_H'].notna()
+    rows = pd.DataFrame({
+        "monto": df['Monto_Neto'].astype('float64'), "costo": df['Costo_OP'].astype('float64'), "tx": 1.0,
+        "pedido": fecha_dias.where(con_lead), "recepcion": fecha_dias + df['Lead_Time_H'].astype('float64') / 24,
+    })
+    base = rows.groupby([df['Local'].astype(str), df['Fecha'].dt.to_period('M').rename('Mes')]).agg(['sum', 'count'])
+    base.columns = [f"{key}_{fn}" for key, fn in base.columns]
+    base = base.rename(index=str, level='Mes')  # "2025-03": formatea los meses únicos, no cada fila
+    if has_balance_source():
+        with open_readonly_db(balance_db_path()) as conn:
+            gastos = pd.read_sql_query(GASTOS_SQL, conn).set_index(['Local', 'Mes'])
+        base = base.join(gastos, how='outer')
+    return base
+
+class KPIEngine:
+    # Evalúa fórmulas en forma vectorizada sobre la base por (Local, Mes); cada medida por nivel y
+    # período se calcula una sola vez y la comparten todos los KPIs que la usan.
+    # Una fórmula sólo suma las filas (Local, Mes) donde están todas sus entradas: si Gastos_Operativos
+    # termina un mes antes que las ventas, ese mes no entra ni al numerador ni al denominador.
+    def __init__(self, base):
+        self.base = base
+        self._levels, self._measures = {}, {}
+        self._meses = sorted(base.index.get_level_values('Mes').unique()) if len(base) else []
+
+    def period(self, periodo):
+        # "trimestre": último trimestre calendario con datos; "anual": últimos 12 meses; None: toda la base
+        if periodo is None or isinstance(periodo, tuple): return periodo
+        if periodo == "trimestre":
+            ultimo = pd.Period(self._meses[-1], 'M').asfreq('Q') if self._meses else None
+            return tuple(m for m in self._meses if pd.Period(m, 'M').asfreq('Q') == ultimo)
+        return tuple(self._meses[-KPI_PERIODOS[periodo]:])
+
+    def period_label(self, periodo="trimestre"):
+        meses = self.period(periodo)
+        if not meses: return None
+        trimestre = pd.Period(meses[-1], 'M').asfreq('Q')
+        return f"Q{trimestre.quarter} {trimestre.year}"
+
+    def requires(self, names):
+        # Columnas de la base que tienen que estar presentes en una fila para que la fórmula la use
+        keys = {KPI_MEASURES[n][0] for n in names if n in KPI_MEASURES}
+        return tuple(sorted(f"{key}_sum" for key in keys if f"{key}_sum" in self.base))
+
+    def _level(self, level, meses=None, required=()):
+        if (level, meses, required) not in self._levels:
+            base = self.base if meses is None else self.base[self.base.index.get_level_values('Mes').isin(meses)]
+            if required: base = base[base[list(required)].notna().all(axis=1)]
+            if level is None: frame = base.sum(min_count=1).to_frame("Total").T
+            else: frame = base.groupby(level=list(level) if isinstance(level, tuple) else level).sum(min_count=1)
+            self._levels[(level, meses, required)] = frame
+        return self._levels[(level, meses, required)]
+
+    def measure(self, name, level=None, periodo=None, required=()):
+        meses = self.period(periodo)
+        if (name, level, meses, required) not in self._measures:
+            frame = self._level(level, meses, required)
+            key, agg = KPI_MEASURES.get(name, (None, None))
+            if f"{key}_sum" not in frame: value = pd.Series(np.nan, index=frame.index)
+            elif agg == "sum": value = frame[f"{key}_sum"]
+            else: value = frame[f"{key}_sum"] / frame[f"{key}_count"]
+            self._measures[(name, level, meses, required)] = value
+        return self._measures[(name, level, meses, required)]
+
+    def evaluate(self, formula, level=None, periodo=None):
+        code, names = compile_formula(formula)
+        required = self.requires(names)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = eval(code, {"__builtins__": {}}, {"m": [self.measure(n, level, periodo, required) for n in names]})
+        return result.replace([np.inf, -np.inf], np.nan)
+
+    def evaluate_all(self, formulas, level=('Local', 'Mes'), periodo=None):
+        return pd.DataFrame({name: self.evaluate(formula, level, periodo) for name, formula in formulas.items()})
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_kpi_engine(version, revision):
+    return KPIEngine(get_kpi_base(version, revision))
+
+def get_current_kpi_engine():
+    version = get_dataset_version()
+    return get_kpi_engine(version, get_audit_ledger(version).revision())
+
+@profiled("data.compute_kpi")
+def compute_kpi(formula, level=None, periodo=KPI_PERIODO):
+    result = get_current_kpi_engine().evaluate(formula, level, periodo)
+    return result.iloc[0] if level is None else result
+
+def compute_kpi_table(categoria, level='Local', periodo=KPI_PERIODO):
+    formulas = {kpi: intel["formula"] for kpi, intel in KPI_MASTER_LOGIC[categoria].items()}
+    return get_current_kpi_engine().evaluate_all(formulas, level, periodo)
+
+def kpi_period_label(periodo=KPI_PERIODO):
+    return get_current_kpi_engine().period_label(periodo) or "Q1 2026"
+
+
+KPI_FORMATS = {
+    "money": "${:,.0f}", "pct": "{:.1f}%", "num": "{:,.1f}", "dias": "{:.1f} Días Promedio", "veces": "{:.1f}x",
+}
+
+def format_kpi(value, formato):
+    if formato == "ratio": return f"{value * 100:.1f}%"
+    return KPI_FORMATS[formato].format(value)
+
+# ==============================================================================
+# 12. PRECOMPUTE WORKER (WARMUP EN SEGUNDO PLANO)
+# ==============================================================================
+PRECOMPUTE_ENABLED = os.environ.get("GRIMOLDI_PRECOMPUTE", "1") != "0"
+PRECOMPUTE_INTERVAL_SECONDS = int(os.environ.get("GRIMOLDI_PRECOMPUTE_INTERVAL_S", INGEST_REFRESH_SECONDS))
+PRECOMPUTE_THREADS = int(os.environ.get("GRIMOLDI_PRECOMPUTE_THREADS", 4))
+PRECOMPUTE_POLL_SECONDS = 1.0  # cada cuánto el placeholder de warmup vuelve a consultar al worker
+
+def default_rango_fechas(index):
+    # Últimos 90 días con datos: lo que ve cualquier sesión nueva, y lo que calienta el worker
+    limites = index.bounds()
+    if limites is None: return None
+    fecha_min, fecha_max = limites[0].date(), limites[1].date()
+    return max(fecha_min, fecha_max - timedelta(days=90)), fecha_max
+
+def rollup_series(rango, measure, agg='sum', by='Bucket'):
+    # (x, y) listos para los charts: x como texto para que el figure cache los use de clave
+    if rango is None: return [], []
+    serie = get_rollup_index().query(rango[0], rango[1], measure, agg, by=by).fillna(0)
+    x = [str(k) for k in serie.index] if by == 'Local' else [k.isoformat() for k in serie.index]
+    return x, [round(float(v), 2) for v in serie]
+
+def chart_revenue_vs_target(rango):
+    # Target: REVENUE_TARGET anual prorrateado por la duración de cada bucket
+    x, real = rollup_series(rango, 'Monto_Neto')
+    paso = pd.Series(pd.to_datetime(x)).diff().median() if len(x) > 1 else pd.Timedelta(days=1)
+    target = [round(MONEY_VALUATION['REVENUE_TARGET'] * (paso / pd.Timedelta(days=365)), 2)] * len(x)
+    return chart_dual_line(real, target, x)
+
+@st.cache_data(show_spinner=False, max_entries=4 * len(SPECIALIZED_UNITS))
+def get_unit_tables(version, revision, unidad):
+    cube = get_local_cube(version)
+    return [get_table_slice(cube, classify_table(nombre)) for nombre in SPECIALIZED_UNITS[unidad]]
+
+def warm_home(version, revision):
+    for card in HOME_CARDS: compute_kpi(card["formula"]); compute_kpi(card["badge"])
+    rango = default_rango_fechas(get_rollup_index(version))
+    x, y = rollup_series(rango, 'Monto_Neto'); chart_stacked_area(y, x)
+    x, y = rollup_series(rango, 'size'); chart_stepped(y, x)
+
+def warm_categories(version, revision):
+    rango = default_rango_fechas(get_rollup_index(version))
+    for cat, kpis in KPI_MASTER_LOGIC.items():
+        for intel in kpis.values(): compute_kpi(intel["formula"])
+        compute_kpi_table(cat)
+    chart_revenue_vs_target(rango); chart_rounded_bar(*rollup_series(rango, 'Monto_Neto', by='Local'))
+    chart_multi_donut(65, 45); chart_radial_gauge(78)
+
+def warm_audit_grid(version, revision):
+    facets = get_audit_store_facets(version, revision)
+    count_audit_rows(version, revision, locales=(), estados=(), fecha_desde=facets["fecha_min"], fecha_hasta=facets["fecha_max"])
+
+def warm_specialized(version, revision):
+    for unidad in SPECIALIZED_UNITS: get_unit_tables(version, revision, unidad)
+
+PRECOMPUTE_TASKS = {"home": warm_home, "categories": warm_categories, "audit_grid": warm_audit_grid, "specialized": warm_specialized}
+
+class PrecomputeWorker:
+    # Un hilo por proceso que corre PRECOMPUTE_TASKS en un pool y los repite cada `interval`, refrescando
+    # antes el ledger. Threads y no procesos: lo calculado tiene que quedar en las caches de este proceso.
+    # Mientras `ready` no está puesto, main() pinta un placeholder liviano y vuelve a correr: ninguna sesión
+    # se sienta sobre el build en frío del ledger y las caches.
+    def __init__(self, interval=PRECOMPUTE_INTERVAL_SECONDS, threads=PRECOMPUTE_THREADS):
+        self.interval, self.threads = interval, threads
+        self.started_at = time.time()
+        self.first_paint = self.first_render = None
+        self.warmup, self.cycles, self.errors = None, 0, {}
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name="grimoldi-precompute", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def alive(self):
+        return self._thread.is_alive()
+
+    def _timed(self, name, task, version, revision):
+        t0 = time.perf_counter()
+        task(version, revision)
+        get_metrics().observe(f"precompute.{name}", time.perf_counter() - t0)
+
+    def run_once(self):
+        t0 = time.perf_counter()
+        version = get_dataset_version()
+        ledger = get_audit_ledger(version)
+        if self.cycles: ledger.refresh()
+        revision = ledger.revision()
+        with ThreadPoolExecutor(self.threads, thread_name_prefix="grimoldi-warm") as pool:
+            futures = {name: pool.submit(self._timed, name, task, version, revision) for name, task in PRECOMPUTE_TASKS.items()}
+        for name, future in futures.items():
+            if future.exception(): self.errors[name] = repr(future.exception())
+            else: self.errors.pop(name, None)
+        elapsed = time.perf_counter() - t0
+        get_metrics().observe("precompute.cycle", elapsed)
+        if self.warmup is None: self.warmup = elapsed
+        self.cycles += 1
+
+    def _loop(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as exc:  # un ciclo fallido no mata el hilo: el próximo reintenta
+                self.errors["cycle"] = repr(exc)
+            self.ready.set()
+            time.sleep(self.interval)
+
+    def warming(self):
+        return self.alive() and not self.ready.is_set()
+
+    def _mark(self, attr, stage):
+        # Segundos desde la primera ejecución del script en este proceso; se registra una sola vez
+        with self._lock:
+            if getattr(self, attr) is not None: return
+            setattr(self, attr, time.time() - self.started_at)
+        get_metrics().observe(stage, getattr(self, attr))
+
+    def mark_first_paint(self):
+        # Lo primero que llega al navegador, placeholder incluido
+        self._mark("first_paint", "startup.time_to_first_paint")
+
+    def mark_first_render(self):
+        self.mark_first_paint()
+        self._mark("first_render", "startup.time_to_first_render")
+
+@st.cache_resource(show_spinner=False)
+def get_precompute_worker():
+    worker = PrecomputeWorker()
+    return worker.start() if PRECOMPUTE_ENABLED else worker
+
+# ==============================================================================
+# 13. RENDER FUNCTIONS
+# ==============================================================================
+SPECIALIZED_TABLES_PER_PAGE = 6
+
+def lazy_nav(opciones, key):
+    # Reemplazo de st.tabs: st.tabs ejecuta todas las pestañas, esto sólo la activa
+    seleccion = st.segmented_control("Vista", opciones, key=key, default=opciones[0], label_visibility="collapsed")
+    return seleccion if seleccion in opciones else opciones[0]
+
+@profiled("data.rango_fechas")
+def select_rango_fechas():
+    # Rango compartido entre vistas (session_state "rango_fechas")
+    index = get_rollup_index()
+    default = default_rango_fechas(index)
+    if default is None: return None
+    fecha_min, fecha_max = index.bounds()[0].date(), default[1]
+    rango = st.date_input("Rango de análisis", st.session_state.get("rango_fechas", default),
+                          min_value=fecha_min, max_value=fecha_max)
+    # Mientras se elige la segunda fecha el widget devuelve una sola: se mantiene el rango anterior
+    if isinstance(rango, tuple) and len(rango) == 2: st.session_state.rango_fechas = rango
+    return st.session_state.get("rango_fechas", default)
+
+@profiled("render.home")
 def render_home():
     inject_cx_industrial_design()
     st.markdown("<h1>SISTEMA DE ANÁLISIS INTEGRAL (D.A.I.)</h1>", unsafe_allow_html=True)
-    st.markdown("<p class='label-cx'>Consolidado Estratégico Grimoldi S.A. | Inteligencia Q1 2026</p>", unsafe_allow_html=True)
-    k1, k2, k3, k4 = st.columns(4)
-    with k1: st.markdown(f'<div class="cx-card"><p class="label-cx">ROI OPERATIVO</p><h2>28.4%</h2><span class="money-badge">$355,000,000</span><div class="pg-container"><div class="pg-bar" style="width:75%"></div></div></div>', unsafe_allow_html=True)
-    with k2: st.markdown(f'<div class="cx-card"><p class="label-cx">MARGEN NETO</p><h2>14.8%</h2><span class="money-badge">$185,000,000</span><div class="pg-container"><div class="pg-bar" style="width:45%"></div></div></div>', unsafe_allow_html=True)
-    with k3: st.markdown(f'<div class="cx-card"><p class="label-cx">EBITDA M$</p><h2>18.2</h2><span class="money-badge">$227,500,000</span><div class="pg-container"><div class="pg-bar" style="width:90%"></div></div></div>', unsafe_allow_html=True)
-    with k4: st.markdown(f'<div class="cx-card"><p class="label-cx">STOCK HEALTH</p><h2>82.0%</h2><span class="money-badge">$1,025,000,000</span><div class="pg-container"><div class="pg-bar" style="width:82%"></div></div></div>', unsafe_allow_html=True)
+    st.markdown(f"<p class='label-cx'>Consolidado Estratégico Grimoldi S.A. | Inteligencia {kpi_period_label()}</p>", unsafe_allow_html=True)
+    for col, card in zip(st.columns(len(HOME_CARDS)), HOME_CARDS):
+        valor, badge = compute_kpi(card["formula"]), compute_kpi(card["badge"])
+        texto = format_kpi(valor, card["formato"]) if pd.notna(valor) else card["ref"][0]
+        badge = format_kpi(badge, "money") if pd.notna(badge) else card["ref"][1]
+        barra = min(max(valor, 0), 100) if pd.notna(valor) and card["formato"] == "pct" else card["barra"]
+        with col: st.markdown(f'<div class="cx-card"><p class="label-cx">{card["label"]}</p><h2>{texto}</h2><span class="money-badge">{badge}</span><div class="pg-container"><div class="pg-bar" style="width:{barra:.0f}%"></div></div></div>', unsafe_allow_html=True)
     st.markdown("---")
     c_left, c_right = st.columns([1, 2])
     with c_left:
@@ -240,130 +1462,161 @@ def render_home():
         if st.button("📦 EFICIENCIA LOGÍSTICA", key="btn_logistica", use_container_width=True): st.session_state.view = 'Category'; st.session_state.category = 'Logística'; st.rerun()
         st.markdown("<br>", unsafe_allow_html=True)
         if st.button("📊 UNIDADES ESPECIALIZADAS (100 TABLAS)", key="btn_specialized", use_container_width=True): st.session_state.view = 'Specialized'; st.rerun()
-        st.write("**Monitor de Cambio de Estado (Stepped)**")
-        st.plotly_chart(chart_stepped([10, 10, 25, 25, 40, 35]), use_container_width=True)
     with c_right:
+        rango = select_rango_fechas()
         st.write("**Performance Histórica (Stacked Area CX)**")
-        st.plotly_chart(chart_stacked_area([120, 250, 200, 450, 380, 550, 600]), use_container_width=True)
+        x, y = rollup_series(rango, 'Monto_Neto')
+        show_chart(chart_stacked_area(y, x), use_container_width=True)
+    with c_left:
+        st.write("**Monitor de Cambio de Estado (Stepped)**")
+        x, y = rollup_series(rango, 'size')
+        show_chart(chart_stepped(y, x), use_container_width=True)
+    with c_right:
         st.markdown(f'<div class="data-explanation"><strong>Análisis:</strong> {get_money_explanation("Revenue Anual", 15)}</div>', unsafe_allow_html=True)
 
+def _reset_audit_page():
+    st.session_state.audit_page = 1
+
+@profiled("render.audit_grid")
+def render_audit_grid():
+    # Sólo la página visible viaja al navegador; filtros, orden y paginado corren en SQLite
+    version = get_dataset_version()
+    revision = get_audit_ledger(version).revision()
+    facets = get_audit_store_facets(version, revision)
+    f1, f2, f3 = st.columns([2, 2, 2])
+    locales = f1.multiselect("Local", facets["locales"], key="audit_locales", on_change=_reset_audit_page)
+    estados = f2.multiselect("Estado", facets["estados"], key="audit_estados", on_change=_reset_audit_page)
+    rango = f3.date_input("Rango de Fecha", (facets["fecha_min"], facets["fecha_max"]),
+                          min_value=facets["fecha_min"], max_value=facets["fecha_max"], key="audit_rango", on_change=_reset_audit_page)
+    fecha_desde, fecha_hasta = (rango + (None, None))[:2] if isinstance(rango, tuple) else (rango, None)
+    o1, o2, o3 = st.columns([2, 1, 1])
+    sort_by = o1.selectbox("Ordenar por", AUDIT_COLUMNS, key="audit_sort", on_change=_reset_audit_page)
+    descending = o2.toggle("Descendente", key="audit_desc", on_change=_reset_audit_page)
+    page_size = o3.selectbox("Filas por página", AUDIT_PAGE_SIZES, index=1, key="audit_page_size", on_change=_reset_audit_page)
+
+    filtros = dict(locales=tuple(locales), estados=tuple(estados), fecha_desde=fecha_desde, fecha_hasta=fecha_hasta)
+    total = count_audit_rows(version, revision, **filtros)
+    paginas = max(1, -(-total // page_size))
+    page = st.number_input(f"Página (de {paginas:,})", min_value=1, max_value=paginas, step=1, key="audit_page")
+    df = query_audit_page(version, page - 1, page_size, sort_by, descending, **filtros)
+    st.markdown(f"<p class='label-cx'>{total:,} registros | página {page:,} de {paginas:,}</p>", unsafe_allow_html=True)
+    show_dataframe(df, height=500, use_container_width=True, hide_index=True, column_config={"ID_TX": st.column_config.NumberColumn(format=ID_TX_FORMAT)})
+
+@profiled("render.category")
 def render_category():
     inject_cx_industrial_design()
     cat = st.session_state.category
     st.markdown(f"<h2>EXPLORACIÓN: {cat.upper()}</h2>", unsafe_allow_html=True)
     if st.button("↩ VOLVER AL PANEL GLOBAL"): st.session_state.view = 'Home'; st.rerun()
     kpis = list(KPI_MASTER_LOGIC[cat].keys())
-    tabs = st.tabs(kpis + ["Auditoría Maestra", "Relaciones Financieras"])
-    for i, kpi in enumerate(kpis):
-        with tabs[i]:
-            intel = KPI_MASTER_LOGIC[cat][kpi]
-            c1, c2 = st.columns([2, 1])
-            with c1:
-                if i == 0: st.plotly_chart(chart_dual_line([30, 45, 55, 40], [35, 40, 50, 55]), use_container_width=True, key=f"cat_dual_{cat}_{i}")
-                elif i == 1: st.plotly_chart(chart_multi_donut(65, 45), use_container_width=True, key=f"cat_donut_{cat}_{i}")
-                elif i == 2: st.plotly_chart(chart_rounded_bar(["A", "B", "C", "D"], [80, 45, 90, 60]), use_container_width=True, key=f"cat_bar_{cat}_{i}")
-                else: st.plotly_chart(chart_radial_gauge(78), use_container_width=True, key=f"cat_gauge_{cat}_{i}")
-                
-                # CUADRO DE TEXTO RECUPERADO Y MEJORADO
-                st.markdown(f"""
-                <div class="data-explanation">
-                    <strong>DETALLE TÉCNICO: {kpi.upper()}</strong><br>
-                    <b>Impacto Económico:</b> {intel["money"]}<br>
-                    <b>Relación Estratégica:</b> {intel["relacion"]}<br>
-                    <b>Fórmula de Cálculo:</b> {intel["formula"]}<br>
-                    <b>Nivel de Impacto:</b> {intel["impacto"]}
-                </div>
-                """, unsafe_allow_html=True)
-
-            with c2: st.markdown(f'<div class="cx-card"><p class="label-cx">VALOR ACTUAL</p><h2 style="color:{CX_THEME["accent"]}">{intel["money"]}</h2><hr><p class="label-cx">IMPACTO EN Q1</p><p>{intel["impacto"]}</p></div>', unsafe_allow_html=True)
-    with tabs[4]:
-        df = get_massive_audit_data()
-        st.dataframe(df, height=500, use_container_width=True)
+    # Navegación por session_state: sólo la vista elegida se calcula y se envía al navegador
+    opciones = kpis + ["Auditoría Maestra", "Relaciones Financieras"]
+    seleccion = lazy_nav(opciones, key=f"nav_cat_{cat}")
+    if seleccion in kpis:
+        i, kpi = kpis.index(seleccion), seleccion
+        intel = KPI_MASTER_LOGIC[cat][kpi]
+        calculado = compute_kpi(intel["formula"])
+        valor = format_kpi(calculado, intel["formato"]) if pd.notna(calculado) else f'{intel["money"]} (ref.)'
+        c1, c2 = st.columns([2, 1])
+        with c1:
+            rango = select_rango_fechas() if i in (0, 2) else None
+            if i == 0:
+                show_chart(chart_revenue_vs_target(rango), use_container_width=True, key=f"cat_dual_{cat}_{i}")
+            elif i == 1: show_chart(chart_multi_donut(65, 45), use_container_width=True, key=f"cat_donut_{cat}_{i}")
+            elif i == 2: show_chart(chart_rounded_bar(*rollup_series(rango, 'Monto_Neto', by='Local')), use_container_width=True, key=f"cat_bar_{cat}_{i}")
+            else: show_chart(chart_radial_gauge(78), use_container_width=True, key=f"cat_gauge_{cat}_{i}")
+            
+            # CUADRO DE TEXTO RECUPERADO Y MEJORADO
+            st.markdown(f"""
+            <div class="data-explanation">
+                <strong>DETALLE TÉCNICO: {kpi.upper()}</strong><br>
+                <b>Impacto Económico:</b> {valor}<br>
+                <b>Relación Estratégica:</b> {intel["relacion"]}<br>
+                <b>Fórmula de Cálculo:</b> {intel["formula"]}<br>
+                <b>Nivel de Impacto:</b> {intel["impacto"]}
+            </div>
+            """, unsafe_allow_html=True)
+            if pd.notna(calculado):
+                desglose = compute_kpi_table(cat)[kpi].map(lambda v: format_kpi(v, intel["formato"]) if pd.notna(v) else "s/d")
+                show_dataframe(desglose.rename(kpi).reset_index(), use_container_width=True, hide_index=True)
+
+        with c2: st.markdown(f'<div class="cx-card"><p class="label-cx">VALOR ACTUAL</p><h2 style="color:{CX_THEME["accent"]}">{valor}</h2><hr><p class="label-cx">IMPACTO EN {kpi_period_label()}</p><p>{intel["impacto"]}</p></div>', unsafe_allow_html=True)
+    elif seleccion == "Auditoría Maestra":
+        render_audit_grid()
 
+@profiled("render.specialized")
 def render_specialized():
     inject_cx_industrial_design()
     st.markdown("<h2>MÓDULO DE UNIDADES ESPECIALIZADAS (DATAMASTER 100)</h2>", unsafe_allow_html=True)
     if st.button("↩ VOLVER AL PANEL GLOBAL"): st.session_state.view = 'Home'; st.rerun()
 
-    df_base = get_massive_audit_data()
-
-    unidades = {
-        "🛒 UNIDAD 1: COMERCIAL Y VENTAS": [
-            "Ranking de Facturación Bruta por Sucursal", "Tabla de Margen de Contribución por Local", "Matriz de Cumplimiento de Objetivos (Venta vs. Target)", 
-            "Desglose de Ticket Promedio por Región", "Tabla de Unidades por Ticket (UPT)", "Ranking de Venta por Metro Cuadrado", 
-            "Matriz de Medios de Pago (Cuotas vs. Contado)", "Tabla de Descuentos Otorgados", "Análisis de Ventas por Franja Horaria", 
-            "Ranking de Best Sellers por Local", "Tabla de Slow Movers (Mercadería estancada)", "Matriz de Ventas Cruzadas (Cross-selling)", 
-            "Tabla de Devoluciones por Motivo", "Ranking de Clientes VIP (Fidelización)", "Tabla de Nuevos Clientes vs. Recurrentes", 
-            "Matriz de Ventas por Género y Edad", "Tabla de Performance de Marcas Propias vs. Licencias", "Ranking de Locales por Tasa de Conversión", 
-            "Tabla de Impacto de Promociones Bancarias", "Matriz de Ventas por Temporada"
-        ],
-        "👥 UNIDAD 2: CAPITAL HUMANO": [
-            "Ranking de Productividad Individual (Venta/Hora)", "Tabla de Costo Laboral sobre Venta", "Matriz de Ausentismo por Sucursal", 
-            "Tabla de Horas Extra por Nodo Logístico", "Ranking de Comisiones a Liquidar", "Tabla de Rotación Temprana (Churn de empleados)", 
-            "Matriz de Capacitación CX", "Tabla de Incidencias Disciplinarias", "Ranking de Satisfacción del Cliente por Vendedor", 
-            "Tabla de Antigüedad vs. Performance", "Matriz de Costos de ART por Región", "Tabla de Gastos de Viáticos y Movilidad", 
-            "Ranking de Líderes de Tienda", "Tabla de Estructura de Dotación", "Matriz de Clima Organizacional", 
-            "Tabla de Productividad en Días Festivos", "Ranking de Cumplimiento de Horarios", "Tabla de Inversión en Uniformes y EPP", 
-            "Matriz de Beneficios vs. Retención", "Tabla de Evolución Salarial Real vs. Inflación"
-        ],
-        "📦 UNIDAD 3: LOGÍSTICA": [
-            "Matriz de Quiebre de Stock (Venta Perdida)", "Ranking de Lead Time CD a Sucursal", "Tabla de Exactitud de Inventario (ERI)", 
-            "Matriz de Transferencias Inter-sucursales", "Tabla de Costo de Flete por Par de Zapato", "Ranking de Proveedores por Tiempo de Entrega", 
-            "Tabla de Calidad de Recepción", "Matriz de Ocupación de Depósito", "Tabla de Antigüedad de Stock (Semanas en piso)", 
-            "Ranking de Velocidad de Picking", "Tabla de Siniestros en Transporte", "Matriz de Costo de Almacenamiento por M3", 
-            "Tabla de Despacho de E-Commerce (SLA)", "Ranking de Devoluciones Logísticas", "Tabla de Eficiencia de Rutas", 
-            "Matriz de Reposición Automática", "Tabla de Gastos de Embalaje e Insumos", "Ranking de Locales por Error de Inventario", 
-            "Tabla de Stock en Tránsito", "Matriz de Consumo Energético en CD"
-        ],
-        "💰 UNIDAD 4: FINANZAS": [
-            "Matriz de EBITDA consolidado por Local", "Tabla de Gastos Fijos (OPEX) por Sucursal", "Ranking de Impuestos por Jurisdicción", 
-            "Tabla de Conciliación Bancaria", "Matriz de Costo Financiero por Tarjeta", "Tabla de Días de Cobro (DSO)", 
-            "Ranking de Cuentas por Pagar", "Tabla de Inversión en Marketing por Campaña", "Matriz de Amortización de Bienes", 
-            "Tabla de Seguros y Pólizas", "Ranking de Gastos de Mantenimiento", "Tabla de Flujo de Caja Proyectado", 
-            "Matriz de Costo de Capital (WACC)", "Tabla de Margen Bruto por Línea de Negocio", "Ranking de Sucursales por ROI de Remodelación", 
-            "Tabla de Auditoría de Compras Directas", "Matriz de Eficiencia Impositiva", "Tabla de Resultado Financiero por Inflación (RECPAM)", 
-            "Ranking de Rentabilidad por M2 de Vidriera", "Tabla de Provisiones y Reservas"
-        ],
-        "🌐 UNIDAD 5: E-COMMERCE": [
-            "Embudo de Conversión Web (Funnel)", "Tabla de Costo de Adquisición de Cliente (CAC)", "Matriz de Tasa de Rebote por Landing Page", 
-            "Ranking de Productos más buscados (sin stock)", "Tabla de Tiempo de Carga de la Web vs. Ventas", "Matriz de Canales de Origen", 
-            "Tabla de Abandono de Carrito por Paso", "Ranking de Cupones de Descuento", "Tabla de Ticket Promedio Online vs. Offline", 
-            "Matriz de Pick-up in Store (Retiro en local)", "Tabla de Reseñas y Calificaciones por Producto", "Ranking de Dispositivos de Compra", 
-            "Tabla de Ubicación Geográfica de Compras Web", "Matriz de Publicidad en Redes Sociales", "Tabla de Tasa de Apertura de Newsletters", 
-            "Ranking de Influencers/Afiliados", "Tabla de Re-compras (Retención)", "Matriz de Errores en el Checkout", 
-            "Tabla de Costo de Logística Inversa", "Ranking de Cumplimiento de Promesa de Entrega"
-        ]
-    }
+    version = get_dataset_version()
+    nombre_unidad = lazy_nav(list(SPECIALIZED_UNITS.keys()), key="nav_spec_unit")
+    tablas = SPECIALIZED_UNITS[nombre_unidad]
+    frames = get_unit_tables(version, get_audit_ledger(version).revision(), nombre_unidad)
+    st.subheader(f"Data Master: {nombre_unidad}")
+    visibles_key = f"spec_visibles_{nombre_unidad}"
+    visibles = st.session_state.get(visibles_key, SPECIALIZED_TABLES_PER_PAGE)
+    cols = st.columns(2)
+    for i, (nombre_tabla, frame) in enumerate(zip(tablas[:visibles], frames)):
+        with cols[i % 2]:
+            st.markdown(f"**{nombre_tabla}**")
+            show_dataframe(frame, use_container_width=True, hide_index=True)
+            st.markdown("---")
+    if visibles < len(tablas):
+        if st.button(f"⬇ CARGAR MÁS TABLAS ({visibles}/{len(tablas)})", key=f"btn_mas_{nombre_unidad}", use_container_width=True):
+            st.session_state[visibles_key] = visibles + SPECIALIZED_TABLES_PER_PAGE; st.rerun()
 
-    tab_units = st.tabs(list(unidades.keys()))
-    for idx, (nombre_unidad, tablas) in enumerate(unidades.items()):
-        with tab_units[idx]:
-            st.subheader(f"Data Master: {nombre_unidad}")
-            cols = st.columns(2)
-            for i, nombre_tabla in enumerate(tablas):
-                with cols[i % 2]:
-                    st.markdown(f"**{nombre_tabla}**")
-                    if "Facturación" in nombre_tabla or "EBITDA" in nombre_tabla or "Margen" in nombre_tabla or "Ventas" in nombre_tabla:
-                        df_res = df_base.groupby('Local')['Monto_Neto'].agg(['sum', 'mean', 'count']).reset_index()
-                        df_res.columns = ['Local', 'Total ($)', 'Promedio ($)', 'Tickets']
-                    elif "Lead Time" in nombre_tabla:
-                        df_res = df_base.groupby('Local')['Lead_Time_H'].mean().reset_index()
-                        df_res.columns = ['Local', 'Promedio Horas']
-                    elif "Satisfacción" in nombre_tabla or "Conversión" in nombre_tabla or "Performance" in nombre_tabla:
-                        df_res = df_base.groupby('Local')['Satisfaccion'].mean().reset_index()
-                        df_res.columns = ['Local', 'Score/Tasa']
-                    elif "Local" in nombre_tabla or "Sucursal" in nombre_tabla or "Región" in nombre_tabla:
-                        df_res = df_base.groupby('Local').size().reset_index(name='Registros')
-                    else:
-                        df_res = pd.DataFrame({"Estado": ["Sin info en base"], "Detalle": ["Requiere conexión a ERP"]})
-                    
-                    st.dataframe(df_res, use_container_width=True, hide_index=True)
-                    st.markdown("---")
+def render_profiling_overlay(metrics, run, worker):
+    with st.expander("⏱ PROFILING: ETAPAS, CACHES Y PAYLOAD", expanded=True):
+        c1, c2 = st.columns(2)
+        with c1:
+            st.write("**Este rerun**")
+            etapas = pd.DataFrame(run["stages"], columns=["Etapa", "Segundos"])
+            etapas = etapas.groupby("Etapa", sort=False)["Segundos"].agg(["count", "sum"])
+            st.dataframe(etapas.set_axis(["Llamadas", "ms"], axis=1).assign(ms=lambda d: d["ms"] * 1000), use_container_width=True)
+            payload = pd.DataFrame(run["payload"], columns=["Elemento", "Bytes"])
+            st.dataframe(payload.groupby("Elemento")["Bytes"].agg(["count", "sum"]).set_axis(["Elementos", "Bytes"], axis=1), use_container_width=True)
+        with c2:
+            st.write("**Proceso (acumulado)**")
+            st.dataframe(pd.DataFrame([{"Etapa": k, "Llamadas": n, "ms total": t * 1000, "ms máx": m * 1000} for k, (n, t, m) in sorted(metrics.stages.items())]),
+                         use_container_width=True, hide_index=True)
+            st.dataframe(pd.DataFrame([{"Cache": k, "Hits": c.hits, "Misses": c.misses, "Hit ratio": c.hits / max(c.hits + c.misses, 1)} for k, c in metrics.caches.items()]),
+                         use_container_width=True, hide_index=True)
+            st.caption(f"Prometheus: http://127.0.0.1:{METRICS_PORT}/metrics")
+            fmt = lambda v: f"{v:.2f}s" if v is not None else "pendiente"
+            st.caption(f"Time-to-first-paint: {fmt(worker.first_paint)} | Primer render completo: {fmt(worker.first_render)} | "
+                       f"Warmup: {fmt(worker.warmup)} | "
+                       f"Ciclos de precompute: {worker.cycles}" + (f" | Errores: {worker.errors}" if worker.errors else ""))
 
-def main():
+def route(worker):
+    if not worker.alive(): refresh_audit_data()  # con el worker corriendo, la ingesta sale del hilo del script
     if st.session_state.view == 'Home': render_home()
     elif st.session_state.view == 'Category': render_category()
     elif st.session_state.view == 'Specialized': render_specialized()
 
+def render_warmup_placeholder(worker):
+    # Barato a propósito: sin ledger ni caches. Espera un poco al worker y vuelve a correr
+    inject_cx_industrial_design()
+    st.markdown("<h1>SISTEMA DE ANÁLISIS INTEGRAL (D.A.I.)</h1>", unsafe_allow_html=True)
+    st.info("Preparando el tablero: calculando datos y caches en segundo plano…")
+    worker.mark_first_paint()
+    worker.ready.wait(PRECOMPUTE_POLL_SECONDS)
+    st.rerun()
+
+def main():
+    worker = get_precompute_worker()
+    if worker.warming(): return render_warmup_placeholder(worker)
+    if not (PROFILE_ENABLED or st.query_params.get("profile") == "1"):
+        route(worker); return worker.mark_first_render()
+    metrics = get_metrics()
+    start_metrics_server()
+    metrics.register_cache("figures", get_figure_cache())
+    metrics.register_cache("frames", get_shared_cache())
+    with metrics.collect_run() as run:
+        route(worker)
+    worker.mark_first_render()
+    render_profiling_overlay(metrics, run, worker)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
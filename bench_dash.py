@@ -0,0 +1,137 @@
+"""Benchmark headless del render path y del data engine de Dash.py con streamlit AppTest.
+
+Cada tamaño de dataset sintético corre en un subproceso propio (RSS pico y caches limpios).
+Por escenario se mide: primera carga de la sesión, rerun en frío y en caliente, llamadas a
+groupby (en toda la secuencia) y bytes serializados enviados al navegador. El RSS pico es uno
+por tamaño: ru_maxrss es un máximo acumulado del proceso, no se puede atribuir a un escenario.
+
+Uso:
+    python bench_dash.py --sizes 1000 100000 --out bench_dash.json
+    python bench_dash.py --compare bench_dash.json  # falla si el rerun en caliente empeora
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+CATEGORY_BUTTONS = {"Comercial": "btn_comercial", "Capital Humano": "btn_rrhh", "Logística": "btn_logistica"}
+
+
+def _payload_bytes(node):
+    # Recorre at.main / at.sidebar (públicos); `children` y `proto` de cada nodo no son API documentada
+    # de AppTest y pueden cambiar entre versiones de streamlit
+    if not hasattr(node, "children"):
+        proto = getattr(node, "proto", None)
+        return proto.ByteSize() if proto is not None else 0
+    return sum(_payload_bytes(child) for child in node.children.values())
+
+
+class GroupbyCounter:
+    def __init__(self):
+        import pandas as pd
+        self.calls = 0
+        for cls in (pd.DataFrame, pd.Series):
+            original = cls.groupby
+
+            def counted(obj, *args, _original=original, **kwargs):
+                self.calls += 1
+                return _original(obj, *args, **kwargs)
+            cls.groupby = counted
+
+
+def _scenarios():
+    # (nombre, preparación sobre el AppTest ya en Home)
+    yield "home", lambda at: None
+    for cat, key in CATEGORY_BUTTONS.items():
+        yield f"category:{cat}", lambda at, key=key: at.button(key=key).click()
+        yield f"category:{cat}:auditoria", lambda at, key=key, cat=cat: (
+            at.button(key=key).click().run(), at.session_state.__setitem__(f"nav_cat_{cat}", "Auditoría Maestra"))
+    yield "specialized", lambda at: at.button(key="btn_specialized").click()
+
+
+def run_worker(rows, timeout):
+    from streamlit.testing.v1 import AppTest
+    counter = GroupbyCounter()
+    results = []
+    for name, prepare in _scenarios():
+        # El primer escenario paga el arranque (dataset, ledger, caches): queda en first_run_s
+        at = AppTest.from_file(str(ROOT / "Dash.py"), default_timeout=timeout)
+        counter.calls = 0
+        timings = []
+        for step in range(3):
+            if step == 1: prepare(at)
+            start = time.perf_counter()
+            at.run()
+            timings.append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(f"{name}: {[e.value for e in at.exception]}")
+        results.append({
+            "rows": rows, "scenario": name,
+            "first_run_s": round(timings[0], 4), "cold_s": round(timings[1], 4), "warm_s": round(timings[2], 4),
+            "groupby_calls": counter.calls,
+            "payload_bytes": _payload_bytes(at.main) + _payload_bytes(at.sidebar),
+        })
+    peak_rss_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    print(json.dumps({"rows": rows, "peak_rss_mb": peak_rss_mb, "results": results}))
+
+
+def run_size(rows, timeout):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, GRIMOLDI_DATA_SOURCE="synthetic", GRIMOLDI_SYNTHETIC_ROWS=str(rows),
+                   GRIMOLDI_CACHE_DIR=cache_dir, GRIMOLDI_SHARED_CACHE="memory", GRIMOLDI_PRECOMPUTE="0")
+        proc = subprocess.run([sys.executable, __file__, "--worker", str(rows), "--timeout", str(timeout)],
+                              env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(current, baseline, tolerance):
+    base = {(r["rows"], r["scenario"]): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        ref = base.get((r["rows"], r["scenario"]))
+        if ref and r["warm_s"] > ref["warm_s"] * (1 + tolerance):
+            regressions.append(f"{r['rows']:>10,} {r['scenario']:<34} {ref['warm_s']:.3f}s -> {r['warm_s']:.3f}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark headless de Dash.py")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--out", type=Path, default=ROOT / "bench_dash.json")
+    parser.add_argument("--compare", type=Path, help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="regresión admitida en warm_s (0.2 = 20%%)")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        return run_worker(args.worker, args.timeout)
+
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    results, peak_rss = [], {}
+    for rows in args.sizes:
+        size = run_size(rows, args.timeout)
+        for r in size["results"]:
+            results.append(r)
+            print(f"{rows:>10,} {r['scenario']:<34} first {r['first_run_s']:>8.3f}s  cold {r['cold_s']:>7.3f}s  warm {r['warm_s']:>7.3f}s  "
+                  f"groupby {r['groupby_calls']:>4}  payload {r['payload_bytes']:>10,}B")
+        peak_rss[str(rows)] = size["peak_rss_mb"]
+        print(f"{rows:>10,} {'peak RSS (proceso)':<34} {size['peak_rss_mb']:.1f}MB")
+    report = {"commit": commit, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "peak_rss_mb": peak_rss, "results": results}
+    if args.compare:
+        regressions = compare(report, json.loads(args.compare.read_text()), args.tolerance)
+    args.out.write_text(json.dumps(report, indent=2))
+    if args.compare and regressions:
+        print("Regresiones:\n" + "\n".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
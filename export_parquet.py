@@ -0,0 +1,24 @@
+"""Conversión única de Grimoldi_Balance_Real.db.zst a un dataset Parquet particionado por Mes.
+
+Uso: python export_parquet.py [destino]
+"""
+import argparse
+from pathlib import Path
+
+import Dash
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("dest", nargs="?", type=Path, default=Dash.BALANCE_CACHE_DIR / "parquet_balance")
+    parser.add_argument("--archive", type=Path, default=Dash.BALANCE_ARCHIVE)
+    args = parser.parse_args()
+    ledger = Dash.export_balance_parquet(args.dest, args.archive)
+    if ledger.hwm is None:
+        print(f"Sin filas en el origen: {args.dest} queda vacío")
+        return
+    print(f"{ledger.rows:,} filas en {args.dest} (hasta {ledger.hwm[0]:%Y-%m-%d %H:%M}, ID_TX {ledger.hwm[1]})")
+
+
+if __name__ == "__main__":
+    main()
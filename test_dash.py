@@ -0,0 +1,199 @@
+import threading
+import time
+
+import pytest
+
+import Dash
+
+
+@pytest.fixture(params=["memory", "arrow"])
+def frame_cache(request, tmp_path):
+    if request.param == "memory": return Dash.MemoryFrameCache()
+    return Dash.ArrowIPCFrameCache(tmp_path / "frames")
+
+
+def test_get_or_compute_is_single_flight(frame_cache):
+    calls, start = [], threading.Barrier(8)
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)  # ventana para que el resto de los hilos llegue mientras se calcula
+        return Dash.build_audit_frame(10, seed=1)
+
+    def worker():
+        start.wait()
+        frame_cache.get_or_compute("k", compute)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert len(calls) == 1
+    assert (frame_cache.misses, frame_cache.hits) == (1, 7)
+    assert len(frame_cache.get("k")) == 10
+    assert frame_cache._locks == {}  # el lock por clave no sobrevive al cálculo
+
+
+def test_shared_frame_key_tracks_dependencies():
+    assert Dash.code_fingerprint(Dash.build_audit_frame, 2026) != Dash.code_fingerprint(Dash.build_audit_frame, 2027)
+    assert Dash.code_fingerprint(Dash.build_audit_frame, 2026) == Dash.code_fingerprint(Dash.build_audit_frame, 2026)
+
+
+def test_ledger_skips_rows_at_or_below_high_water_mark(tmp_path):
+    df = Dash.build_audit_frame(500, seed=1)
+    ledger = Dash.AuditLedger(tmp_path, lambda hwm: None)
+    assert len(ledger.ingest(df.iloc[:300])) == 300
+    # Lote solapado: sólo entran las 200 filas posteriores al high-water mark
+    assert len(ledger.ingest(df.iloc[200:])) == 200
+    assert len(ledger.ingest(df)) == 0
+    # Un proceso nuevo relee el high-water mark de _ledger.json y tampoco duplica
+    reopened = Dash.AuditLedger(tmp_path, lambda hwm: None)
+    assert len(reopened.ingest(df)) == 0
+    assert reopened.revision() == 500
+    assert reopened.read_frame(['Fecha', 'ID_TX'])['ID_TX'].tolist() == df['ID_TX'].tolist()
+
+
+def test_ledger_compaction_keeps_every_row(tmp_path, monkeypatch):
+    monkeypatch.setattr(Dash, "LEDGER_COMPACT_PARTS", 2)
+    df = Dash.build_audit_frame(300, seed=1, window=Dash.timedelta(days=20))
+    ledger = Dash.AuditLedger(tmp_path, lambda hwm: None)
+    for start in range(0, 300, 30): ledger.ingest(df.iloc[start:start + 30])
+    assert len(list(tmp_path.glob("Mes=*/part-*.parquet"))) <= 2
+    assert ledger.read_frame(['Fecha', 'ID_TX'])['ID_TX'].tolist() == df['ID_TX'].tolist()
+
+
+def test_compile_formula_maps_names_to_measures():
+    code, names = Dash.compile_formula("(Revenue - (COGS + SG&A)) / Revenue * 100")
+    assert names == ("Revenue", "COGS", "SG&A")
+    assert eval(code, {"__builtins__": {}}, {"m": [200.0, 50.0, 30.0]}) == 60.0
+    code, names = Dash.compile_formula("Total Revenue / N Transacciones")
+    assert names == ("Total Revenue", "N Transacciones")
+    assert eval(code, {"__builtins__": {}}, {"m": [90.0, 3.0]}) == 30.0
+
+
+def test_kpi_engine_scopes_to_latest_quarter():
+    index = Dash.pd.MultiIndex.from_product([["A", "B"], ["2025-08", "2025-09", "2025-10", "2025-11"]], names=["Local", "Mes"])
+    base = Dash.pd.DataFrame({"monto_sum": 1.0, "monto_count": 1}, index=index)
+    engine = Dash.KPIEngine(base)
+    assert engine.period("trimestre") == ("2025-10", "2025-11")
+    assert engine.period_label() == "Q4 2025"
+    assert engine.evaluate("Revenue", periodo="trimestre").iloc[0] == 4.0
+    assert engine.evaluate("Revenue").iloc[0] == 8.0
+
+
+def test_kpi_engine_skips_months_missing_an_input():
+    # Gastos termina en noviembre y las ventas siguen en diciembre: diciembre no entra al margen
+    index = Dash.pd.MultiIndex.from_product([["A"], ["2025-10", "2025-11", "2025-12"]], names=["Local", "Mes"])
+    base = Dash.pd.DataFrame({"monto_sum": [100.0, 100.0, 100.0], "monto_count": 1, "costo_sum": [40.0, 40.0, 40.0],
+                              "costo_count": 1, "gasto_total_sum": [20.0, 20.0, None]}, index=index)
+    engine = Dash.KPIEngine(base)
+    margen = "(Revenue - (COGS + SG&A)) / Revenue * 100"
+    assert engine.evaluate(margen, periodo="trimestre").iloc[0] == 40.0
+    assert engine.evaluate(margen, level='Mes', periodo="trimestre").dropna().index.tolist() == ["2025-10", "2025-11"]
+    assert engine.evaluate("Revenue", periodo="trimestre").iloc[0] == 300.0
+
+
+def test_ledger_reads_do_not_wait_for_fetch(tmp_path):
+    df = Dash.build_audit_frame(200, seed=1)
+    fetching = threading.Event()
+
+    def slow_fetch(hwm):
+        fetching.set()
+        time.sleep(1.0)
+        return df
+
+    ledger = Dash.AuditLedger(tmp_path, slow_fetch)
+    ledger.ingest(df.iloc[:100])
+    refresher = threading.Thread(target=ledger.refresh)
+    refresher.start()
+    fetching.wait()
+    start = time.perf_counter()
+    assert ledger.rollup_index().rows == 100
+    assert time.perf_counter() - start < 0.5
+    refresher.join()
+    assert ledger.revision() == 200
+
+
+def test_dataset_version_tracks_ingest_code(monkeypatch):
+    before = Dash.get_dataset_version()
+    Dash.data_fingerprint.cache_clear()
+    monkeypatch.setattr(Dash, "AUDIT_DTYPES", {**Dash.AUDIT_DTYPES, 'Monto_Neto': 'float64'})
+    assert Dash.get_dataset_version() != before
+    Dash.data_fingerprint.cache_clear()
+
+
+def test_audit_frame_meets_bytes_per_row_target():
+    df = Dash.build_audit_frame(100_000, seed=1)
+    assert Dash.audit_bytes_per_row(df) <= Dash.AUDIT_BYTES_PER_ROW_TARGET
+    assert df['Fecha'].is_monotonic_increasing
+    assert df['Fecha'].min() >= Dash.pd.Timestamp(Dash.SYNTHETIC_START)
+    assert df['Fecha'].max() < Dash.pd.Timestamp(Dash.SYNTHETIC_START + Dash.SYNTHETIC_WINDOW)
+
+
+def test_open_readonly_db_quotes_path_and_closes(tmp_path):
+    path = tmp_path / "cache ?#%" / "store.db"
+    path.parent.mkdir()
+    with Dash.closing(Dash.sqlite3.connect(path)) as conn, conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+    with Dash.open_readonly_db(path) as conn:
+        assert conn.execute("SELECT x FROM t").fetchall() == [(1,)]
+        with pytest.raises(Dash.sqlite3.OperationalError): conn.execute("INSERT INTO t VALUES (2)")
+    with pytest.raises(Dash.sqlite3.ProgrammingError): conn.execute("SELECT 1")
+
+
+def test_rollup_add_matches_rebuild():
+    df = Dash.build_audit_frame(20_000, seed=1)
+    full, incremental = Dash.RollupIndex(), Dash.RollupIndex()
+    full.rebuild(df, len(df))
+    for start in range(0, len(df), 2_857): incremental.add(df.iloc[start:start + 2_857])
+    assert incremental.rows == full.rows == len(df)
+    for res in Dash.ROLLUP_RESOLUTIONS.values():
+        Dash.pd.testing.assert_frame_equal(incremental.frames[res][0], full.frames[res][0], check_dtype=False)
+        assert (incremental.frames[res][1] == full.frames[res][1]).all()
+
+
+def test_rollup_query_range_is_inclusive_of_last_day():
+    df = Dash.build_audit_frame(24 * 10, seed=1, window=Dash.timedelta(days=10))
+    index = Dash.RollupIndex()
+    index.rebuild(df, len(df))
+    dias = df[(df['Fecha'] >= "2024-01-03") & (df['Fecha'] < "2024-01-06")]
+    serie = index.query("2024-01-03", "2024-01-05", resolution="D")
+    assert serie.index.min() == Dash.pd.Timestamp("2024-01-03") and serie.index.max() == Dash.pd.Timestamp("2024-01-05")
+    assert abs(serie.sum() - dias['Monto_Neto'].astype('float64').sum()) < 1e-6
+    assert index.query("2024-01-03 13:00", "2024-01-03", 'size', resolution="h").sum() == 11
+    por_local = index.query("2024-01-03", "2024-01-05", by='Local', resolution="D")
+    assert abs(por_local.sum() - serie.sum()) < 1e-6
+
+
+@pytest.fixture
+def audit_store(tmp_path, monkeypatch):
+    df = Dash.build_audit_frame(24 * 10, seed=1, window=Dash.timedelta(days=10))
+    path = tmp_path / "audit.db"
+    Dash._write_audit_store(path, df)
+    monkeypatch.setattr(Dash, "materialize_audit_store", lambda version: path)
+    return str(tmp_path), df
+
+
+def test_audit_page_fecha_hasta_is_inclusive(audit_store):
+    version, df = audit_store
+    page = Dash.query_audit_page(version, page_size=500, fecha_desde="2024-01-02", fecha_hasta="2024-01-03")
+    esperado = df[(df['Fecha'] >= "2024-01-02") & (df['Fecha'] < "2024-01-04")]
+    assert page['ID_TX'].tolist() == esperado['ID_TX'].tolist()
+    assert Dash.count_audit_rows(version, 0, fecha_desde="2024-01-02", fecha_hasta="2024-01-03") == len(esperado) == 48
+
+
+def test_audit_page_filters_by_local_and_estado(audit_store):
+    version, df = audit_store
+    page = Dash.query_audit_page(version, page_size=500, locales=("Abasto", "Florida"), estados=("Validado",))
+    esperado = df[df['Local'].isin(["Abasto", "Florida"]) & (df['Estado'] == "Validado")]
+    assert page['ID_TX'].tolist() == esperado['ID_TX'].tolist()
+    assert set(page['Local']) <= {"Abasto", "Florida"} and set(page['Estado']) == {"Validado"}
+
+
+def test_audit_page_limit_offset_and_sort(audit_store):
+    version, df = audit_store
+    paginas = [Dash.query_audit_page(version, page, 50, 'Monto_Neto', descending=True) for page in range(5)]
+    assert [len(p) for p in paginas] == [50, 50, 50, 50, 40]
+    ids = Dash.pd.concat(paginas)['ID_TX'].tolist()
+    assert ids == df.sort_values(['Monto_Neto', 'ID_TX'], ascending=False)['ID_TX'].tolist()
+    with pytest.raises(ValueError): Dash.query_audit_page(version, sort_by="Monto_Neto; DROP TABLE audit")